@@ -0,0 +1,316 @@
+"""
+Benchmark for the detection hot path.
+
+Runs CheatingDetector.process_frame over synthetic and/or recorded frames at
+several resolutions and face-present ratios, and reports per-stage timings,
+throughput and latency percentiles as JSON so results can be diffed between
+versions:
+
+    python bench.py --face-frames recordings/frames/ --output bench.json
+    python bench.py --resolutions 720p --face-ratios 1.0 --pipeline adaptive
+
+Frames with a face come from --face-frames (recorded webcam images, resized to
+each resolution); synthetic frames are noise and never contain a face, so
+without --face-frames only the no-face path is measured.
+
+The pupil search is also timed on its own, on synthetic eye regions with and
+without specks (eyelashes, sensor noise), against the per-eye contour search
+it replaced; these cases need no FaceMesh model.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from cheating import CheatingDetector
+from inference import AdaptiveLandmarker, create_face_mesh, landmarks_to_array
+from instrumentation import StageRecorder
+from pupils import PupilAnalyzer
+
+RESOLUTIONS = {
+    "480p": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+}
+
+
+class TimedFaceMeshLandmarker:
+    """In-process landmarker that reports color conversion and FaceMesh separately"""
+
+    def __init__(self, observer):
+        self.observer = observer
+        self.face_mesh = create_face_mesh()
+
+    def detect(self, frame):
+        start = time.perf_counter()
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        converted = time.perf_counter()
+        results = self.face_mesh.process(rgb_frame)
+        done = time.perf_counter()
+        self.observer("color_convert", converted - start)
+        self.observer("face_mesh", done - converted)
+        if not results.multi_face_landmarks:
+            return None
+        return landmarks_to_array(results.multi_face_landmarks[0])
+
+    def close(self):
+        self.face_mesh.close()
+
+
+class ContourPupilAnalyzer(PupilAnalyzer):
+    """The per-eye contour search PupilAnalyzer replaced, kept as its baseline"""
+
+    def analyze(self, frame, left_eye, right_eye):
+        h, w = frame.shape[:2]
+        centers = []
+        for eye in (left_eye, right_eye):
+            left, top, right, bottom = self.eye_box(eye, w, h)
+            center = None
+            if right > left and bottom > top:
+                gray = cv2.cvtColor(frame[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+                _, thresh = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY_INV)
+                contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                if contours:
+                    moments = cv2.moments(max(contours, key=cv2.contourArea))
+                    if moments["m00"] != 0:
+                        center = (left + int(moments["m10"] / moments["m00"]),
+                                  top + int(moments["m01"] / moments["m00"]))
+            centers.append(center)
+        return centers[0], centers[1]
+
+
+def load_face_frames(path):
+    names = sorted(os.listdir(path))
+    frames = [cv2.imread(os.path.join(path, n), cv2.IMREAD_COLOR) for n in names]
+    return [f for f in frames if f is not None]
+
+def synthetic_frame(rng, size):
+    w, h = size
+    return rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+def encode_payload(frame, payload, quality):
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if payload == "raw":
+        return buffer.tobytes()
+    return "data:image/jpeg;base64," + base64.b64encode(buffer).decode("utf-8")
+
+def synthetic_profile(size):
+    """A plausible calibration for a centered face, used when no face frames are given"""
+    w, h = size
+    cx, cy, fw = w // 2, h // 2, w // 4
+    return {
+        "version": 1,
+        "calibration_data": {
+            "0": {"head": [cx, cy], "face_width": fw},
+            "1": {"head": [cx - fw // 4, cy], "face_width": fw},
+            "2": {"head": [cx + fw // 4, cy], "face_width": fw + fw // 8},
+            "3": {"head": [cx, cy - fw // 8], "face_width": fw},
+            "4": {"head": [cx, cy + fw // 8], "face_width": fw},
+        },
+        "calibrated_positions": {
+            "center": [[cx - fw / 4, cy - fw / 8], [cx + fw / 4, cy - fw / 8]],
+            "left": [[cx - fw / 4 - 10, cy - fw / 8], [cx + fw / 4 - 10, cy - fw / 8]],
+            "right": [[cx - fw / 4 + 10, cy - fw / 8], [cx + fw / 4 + 10, cy - fw / 8]],
+        }
+    }
+
+def build_detector(args, recorder, size, face_frames):
+    landmarker = TimedFaceMeshLandmarker(recorder)
+    if args.pipeline == "adaptive":
+        landmarker = AdaptiveLandmarker(landmarker, TimedFaceMeshLandmarker(recorder))
+    detector = CheatingDetector(annotate=args.annotate, landmarker=landmarker)
+
+    if args.calibration:
+        with open(args.calibration) as f:
+            detector.load_calibration(json.load(f))
+    elif face_frames:
+        # Calibrate on the first recorded frame for every step; the timings do
+        # not depend on the exact thresholds
+        calibration_frame = cv2.resize(face_frames[0], size)
+        detector.start_calibration()
+        for _ in range(5):
+            result = detector.calibrate_frame(calibration_frame)
+            if result["status"] == "error":
+                sys.exit(f"Calibration failed on the first face frame: {result['message']}")
+    else:
+        detector.load_calibration(synthetic_profile(size))
+
+    detector.stage_observer = recorder
+    return detector
+
+def eye_frame(rng, size, specks):
+    """A frame with two eyes (dark pupils with a highlight) and their landmark boxes, as PupilAnalyzer takes them"""
+    w, h = size
+    frame = np.full((h, w, 3), 150, np.uint8)
+    eye_w, eye_h = w // 20, w // 50
+    radius = max(2, eye_w // 6)
+    eyes = []
+    for cx in (w // 2 - w // 16, w // 2 + w // 16):
+        cy = h // 2
+        frame[cy - radius:cy + radius, cx - radius:cx + radius] = 20
+        frame[cy - radius // 2:cy, cx:cx + radius // 2] = 255
+        for _ in range(specks):
+            x, y = rng.integers(cx - eye_w, cx + eye_w), rng.integers(cy - eye_h, cy + eye_h)
+            frame[y, x] = 20
+        eyes.append(np.array([[cx - eye_w, cy - eye_h], [cx + eye_w, cy + eye_h]]))
+    return frame, eyes[0], eyes[1]
+
+def pupil_case(args, resolution):
+    """Time PupilAnalyzer and the contour search it replaced on clean and speckled eye regions"""
+    size = RESOLUTIONS[resolution]
+    rng = np.random.default_rng(args.seed)
+    case = {"resolution": resolution}
+    for name, specks in (("clean", 0), ("speckled", 100)):
+        frame, left_eye, right_eye = eye_frame(rng, size, specks)
+        timings = {}
+        for label, analyzer in (("analyzer", PupilAnalyzer()), ("contours", ContourPupilAnalyzer())):
+            for _ in range(args.warmup):
+                analyzer.analyze(frame, left_eye, right_eye)
+            durations = []
+            for _ in range(args.pupil_frames):
+                t0 = time.perf_counter()
+                analyzer.analyze(frame, left_eye, right_eye)
+                durations.append(time.perf_counter() - t0)
+            timings[label] = summarize_ms(durations)
+        case[name] = timings
+    return case
+
+def summarize_ms(values):
+    """Mean and percentiles of durations given in seconds, in milliseconds"""
+    ms = np.asarray(values) * 1000.0
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p90": round(float(p90), 3),
+        "p99": round(float(p99), 3),
+    }
+
+def run_case(args, resolution, face_ratio, face_frames):
+    size = RESOLUTIONS[resolution]
+    rng = np.random.default_rng(args.seed)
+
+    # Pre-encode the payloads so encoding is not part of the measurement
+    payloads = []
+    for i in range(args.frames):
+        has_face = face_frames and rng.random() < face_ratio
+        if has_face:
+            frame = cv2.resize(face_frames[i % len(face_frames)], size)
+        else:
+            frame = synthetic_frame(rng, size)
+        payloads.append(encode_payload(frame, args.payload, args.quality))
+
+    recorder = StageRecorder()
+    detector = build_detector(args, recorder, size, face_frames)
+    try:
+        for payload in payloads[:args.warmup]:
+            detector.process_frame(payload)
+        recorder.clear()
+
+        latencies = []
+        statuses = {}
+        started = time.perf_counter()
+        for payload in payloads:
+            t0 = time.perf_counter()
+            result = detector.process_frame(payload)
+            latencies.append(time.perf_counter() - t0)
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+        elapsed = time.perf_counter() - started
+    finally:
+        detector.close()
+
+    return {
+        "resolution": resolution,
+        "width": size[0],
+        "height": size[1],
+        "face_ratio": face_ratio,
+        "frames": len(payloads),
+        "statuses": statuses,
+        "fps": round(len(payloads) / elapsed, 2),
+        "latency_ms": summarize_ms(latencies),
+        "stages_ms": {stage: summarize_ms(durations)
+                      for stage, durations in sorted(recorder.durations.items())},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the cheating detection hot path")
+    parser.add_argument("--resolutions", default="480p,720p,1080p",
+                        help=f"comma-separated subset of {','.join(RESOLUTIONS)}")
+    parser.add_argument("--face-ratios", default="1.0,0.5,0.0",
+                        help="comma-separated fractions of frames that contain a face")
+    parser.add_argument("--face-frames", help="directory of recorded frames containing a face")
+    parser.add_argument("--calibration", help="calibration profile (JSON) to use instead of calibrating")
+    parser.add_argument("--frames", type=int, default=200, help="frames measured per case")
+    parser.add_argument("--warmup", type=int, default=10, help="frames run before measuring")
+    parser.add_argument("--payload", choices=["dataurl", "raw"], default="dataurl",
+                        help="frame encoding sent to process_frame")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG quality of the input frames")
+    parser.add_argument("--pipeline", choices=["full", "adaptive"], default="full")
+    parser.add_argument("--no-annotate", dest="annotate", action="store_false",
+                        help="measure the results-only mode")
+    parser.add_argument("--pupil-frames", type=int, default=2000,
+                        help="frames measured per pupil search case (0 skips them)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    face_frames = load_face_frames(args.face_frames) if args.face_frames else []
+    face_ratios = [float(r) for r in args.face_ratios.split(",")]
+    if not face_frames:
+        print("No --face-frames given: measuring the no-face path only", file=sys.stderr)
+        face_ratios = [0.0]
+
+    cases = []
+    for resolution in args.resolutions.split(","):
+        for face_ratio in face_ratios:
+            case = run_case(args, resolution, face_ratio, face_frames)
+            cases.append(case)
+            print(f"{resolution:>6} face={face_ratio:.2f} {case['fps']:8.1f} fps  "
+                  f"p50={case['latency_ms']['p50']:.2f}ms p99={case['latency_ms']['p99']:.2f}ms",
+                  file=sys.stderr)
+
+    pupil_cases = []
+    if args.pupil_frames > 0:
+        for resolution in args.resolutions.split(","):
+            case = pupil_case(args, resolution)
+            pupil_cases.append(case)
+            print(f"{resolution:>6} pupils  clean {case['clean']['analyzer']['p50'] * 1000:.0f}us "
+                  f"(contours {case['clean']['contours']['p50'] * 1000:.0f}us)  "
+                  f"speckled {case['speckled']['analyzer']['p50'] * 1000:.0f}us "
+                  f"(contours {case['speckled']['contours']['p50'] * 1000:.0f}us)", file=sys.stderr)
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+        },
+        "config": {
+            "frames": args.frames,
+            "payload": args.payload,
+            "quality": args.quality,
+            "pipeline": args.pipeline,
+            "annotate": args.annotate,
+            "seed": args.seed,
+        },
+        "cases": cases,
+        "pupils_ms": pupil_cases,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,102 @@
 import cv2
-import mediapipe as mp
 import numpy as np
 import time
 import base64
+from inference import FaceMeshLandmarker
+from pupils import PupilAnalyzer
+from instrumentation import StageClock, NULL_CLOCK
+
+def decode_payload(img_data):
+    """
+    Return the encoded image bytes from a base64 data URL; bytes-like input is
+    returned as is. Returns None if the string is not a base64 data URL.
+    """
+    if isinstance(img_data, str):
+        try:
+            encoded_data = img_data.split(',')[1]
+            return base64.b64decode(encoded_data)
+        except (IndexError, ValueError):
+            # No comma, or bad base64 (binascii.Error is a ValueError)
+            return None
+    return img_data
+
+def decode_buffer(buffer):
+    """Decode encoded image bytes straight from their buffer; None if not a valid image"""
+    if buffer is None:
+        return None
+    try:
+        nparr = np.frombuffer(buffer, np.uint8)
+    except TypeError:
+        # Not bytes-like, e.g. a number sent as the JSON image field
+        return None
+    if nparr.size == 0:
+        return None
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def decode_image(img_data):
+    """
+    Decode a frame from either a base64 data URL string or raw encoded bytes
+    (JPEG/WebP). Bytes-like input is decoded straight from its buffer without
+    an intermediate copy. Returns None if the data is not a valid image.
+    """
+    return decode_buffer(decode_payload(img_data))
+
+def parse_calibration(profile):
+    """
+    Validate a profile produced by CheatingDetector.export_calibration and
+    return its (calibration_data, calibrated_positions). Raises ValueError,
+    KeyError or TypeError if it is malformed.
+    """
+    if not isinstance(profile, dict):
+        raise TypeError("Calibration profile must be an object")
+    if profile.get("version") != 1:
+        raise ValueError(f"Unsupported calibration profile version: {profile.get('version')}")
+    
+    calibration_data = {
+        int(step): {"head": tuple(int(v) for v in data["head"]), "face_width": int(data["face_width"])}
+        for step, data in profile["calibration_data"].items()
+    }
+    if sorted(calibration_data) != list(range(5)):
+        raise ValueError("Calibration profile must have steps 0-4")
+    if any(len(data["head"]) != 2 for data in calibration_data.values()):
+        raise ValueError("Calibration head positions must be (x, y)")
+    
+    calibrated_positions = {}
+    for key, (right, left) in profile["calibrated_positions"].items():
+        right, left = np.array(right, dtype=float), np.array(left, dtype=float)
+        if right.shape != (2,) or left.shape != (2,) or not (np.isfinite(right).all() and np.isfinite(left).all()):
+            raise ValueError(f"Invalid calibrated iris position: {key}")
+        calibrated_positions[key] = (right, left)
+    return calibration_data, calibrated_positions
 
 class CheatingDetector:
     def __init__(self, ear_threshold=0.25, eye_closed_time_limit=0.5,                   #def __init__(self, ear_threshold=0.25, eye_closed_time_limit=0.5,
-                 eye_movement_threshold_lr=5, eye_movement_threshold_ud=5):             #eye_movement_threshold_lr=5, eye_movement_threshold_ud=5):              
-        # Initialize MediaPipe modules
-        self.mp_face_mesh = mp.solutions.face_mesh
-        
-        # Main face mesh for detection
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            static_image_mode=False, 
-            max_num_faces=1, 
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+                 eye_movement_threshold_lr=5, eye_movement_threshold_ud=5,              #eye_movement_threshold_lr=5, eye_movement_threshold_ud=5):              
+                 annotate=True, landmarker=None):
+        # Landmark source: an in-process FaceMesh graph unless a shared
+        # inference pool hands us a PooledLandmarker
+        self.landmarker = landmarker if landmarker is not None else FaceMeshLandmarker()
+        
+        # Optional callable(stage, seconds) that receives per-stage timings
+        self.stage_observer = None
+        
+        # Pupil localization for both eyes, with buffers reused across frames
+        self.pupils = PupilAnalyzer()
+        
+        # Optional MotionGate that lets near-static frames reuse the previous
+        # landmarks; calibration frames always get a fresh pass
+        self.motion_gate = None
+        
+        # Optional FaceCountCheck that flags more than one face in view
+        self.face_check = None
+        
+        # Optional LandmarkSpotCheck that verifies client-submitted landmarks
+        # against the server's own on periodic full frames
+        self.landmark_check = None
+        
+        # Optional callable(frame, timestamp) that receives every decoded frame before it
+        # is analyzed and annotated, e.g. to buffer evidence snapshots
+        self.frame_sink = None
         
         # Smoothing factor
         self.alpha = 0.4
@@ -28,6 +107,9 @@ class CheatingDetector:
         self.frames_threshold_lr = eye_movement_threshold_lr
         self.frames_threshold_ud = eye_movement_threshold_ud
         
+        # Whether process_frame draws overlays and returns the re-encoded frame
+        self.annotate = annotate
+        
         # Calibration state
         self.calibrated = False
         self.tracking_started = False
@@ -38,12 +120,12 @@ class CheatingDetector:
         self.nose_landmark = 1
         self.left_face_landmark = 234
         self.right_face_landmark = 454
-        self.left_eye_landmarks = [33, 133, 160, 158, 159, 144, 153, 145, 154, 163, 7, 246]
-        self.right_eye_landmarks = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387]
+        self.left_eye_landmarks = np.array([33, 133, 160, 158, 159, 144, 153, 145, 154, 163, 7, 246])
+        self.right_eye_landmarks = np.array([362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387])
         
         # EAR calculation landmarks
-        self.left_ear_landmarks = [33, 160, 158, 133, 153, 144]
-        self.right_ear_landmarks = [362, 385, 387, 263, 373, 380]
+        self.left_ear_landmarks = np.array([33, 160, 158, 133, 153, 144])
+        self.right_ear_landmarks = np.array([362, 385, 387, 263, 373, 380])
         
         # Head movement thresholds (computed after calibration)
         self.head_movement_tolerance = None
@@ -64,31 +146,44 @@ class CheatingDetector:
         self.left_cheating_detected = False
         self.right_cheating_detected = False
         
+        # Capture time of the latest analyzed frame; all timers run on frame time
+        self.last_frame_time = None
+        
         # For iris tracking
         self.calibrated_positions = {}  # Will store center, left, right positions
 
+    def close(self):
+        """Release the FaceMesh graph used by this detector"""
+        self.landmarker.close()
+
+    def stage_clock(self):
+        """Clock for timing the stages of one frame (a no-op without an observer)"""
+        if self.stage_observer is None:
+            return NULL_CLOCK
+        return StageClock(self.stage_observer)
+
     def smooth_position(self, new_pos, smoothed_pos):
         """Applies exponential moving average (EMA) for smoothing."""
         if smoothed_pos is None:
             return new_pos  # Initialize with the first position
         return self.alpha * new_pos + (1 - self.alpha) * smoothed_pos
 
-    def get_iris_center(self, face_landmarks, w, h):
-        """Calculates the center of the iris using key iris landmarks."""
-        right_iris_x = (face_landmarks.landmark[468].x + face_landmarks.landmark[472].x) / 2 * w
-        right_iris_y = (face_landmarks.landmark[468].y + face_landmarks.landmark[472].y) / 2 * h
-
-        left_iris_x = (face_landmarks.landmark[473].x + face_landmarks.landmark[477].x) / 2 * w
-        left_iris_y = (face_landmarks.landmark[473].y + face_landmarks.landmark[477].y) / 2 * h
-
-        return np.array([right_iris_x, right_iris_y]), np.array([left_iris_x, left_iris_y])
+    def get_iris_center(self, coords, w, h):
+        """Calculates the center of the iris from the normalized landmark array."""
+        size = np.array([w, h])
+        right_iris = (coords[468] + coords[472]) / 2 * size
+        left_iris = (coords[473] + coords[477]) / 2 * size
+        return right_iris, left_iris
 
     def compute_EAR(self, eye_points, landmarks):
         """Compute Eye Aspect Ratio using Euclidean distances between the landmarks."""
-        p2_minus_p6 = np.linalg.norm(np.array(landmarks[eye_points[1]]) - np.array(landmarks[eye_points[5]]))
-        p3_minus_p5 = np.linalg.norm(np.array(landmarks[eye_points[2]]) - np.array(landmarks[eye_points[4]]))
-        p1_minus_p4 = np.linalg.norm(np.array(landmarks[eye_points[0]]) - np.array(landmarks[eye_points[3]]))
-        EAR = (p2_minus_p6 + p3_minus_p5) / (2.0 * p1_minus_p4)
+        p = landmarks[eye_points]
+        # p2-p6, p3-p5 and p1-p4 in one call
+        distances = np.linalg.norm(p[[1, 2, 0]] - p[[5, 4, 3]], axis=1)
+        # A collapsed eye (e.g. a tiny face in pixels) has no measurable opening
+        if distances[2] == 0:
+            return 0.0
+        EAR = (distances[0] + distances[1]) / (2.0 * distances[2])
         return EAR
 
     def start_calibration(self):
@@ -97,6 +192,10 @@ class CheatingDetector:
         self.current_step = 0
         self.calibration_data = {}
         self.calibrated_positions = {}
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        if self.face_check is not None:
+            self.face_check.reset()
         
         # Define calibration steps for the frontend
         calibration_steps = [
@@ -115,32 +214,34 @@ class CheatingDetector:
         }
 
     def process_calibration_step(self, img_data):
-        """Process one calibration step with the given image data"""
-        # Decode image data
-        encoded_data = img_data.split(',')[1]
-        nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
+        """Process one calibration step with a data URL or raw encoded image"""
+        frame = decode_image(img_data)
+        if frame is None:
+            return {
+                "status": "error",
+                "message": "Could not decode image data"
+            }
+        return self.calibrate_frame(frame)
+
+    def calibrate_frame(self, frame):
+        """Process one calibration step with an already decoded BGR frame"""
         h, w, _ = frame.shape
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_frame)
+        coords = self.landmarker.detect(frame)
         
-        if not results.multi_face_landmarks:
+        if coords is None:
             return {
                 "status": "error",
                 "message": "No face detected in calibration image"
             }
         
         # Get landmarks for current step
-        face_landmarks = results.multi_face_landmarks[0]
-        landmarks_dict = {idx: (int(lm.x * w), int(lm.y * h))
-                         for idx, lm in enumerate(face_landmarks.landmark)}
+        pts = (coords * (w, h)).astype(int)
         
-        head_x, head_y = landmarks_dict[self.nose_landmark]
-        face_width = abs(landmarks_dict[self.left_face_landmark][0] - landmarks_dict[self.right_face_landmark][0])
+        head_x, head_y = pts[self.nose_landmark].tolist()
+        face_width = abs(int(pts[self.left_face_landmark, 0] - pts[self.right_face_landmark, 0]))
         
         # Get iris positions for tracking calibration
-        right_iris, left_iris = self.get_iris_center(face_landmarks, w, h)
+        right_iris, left_iris = self.get_iris_center(coords, w, h)
         
         # Store calibration data
         self.calibration_data[self.current_step] = {
@@ -167,14 +268,7 @@ class CheatingDetector:
         # Check if all calibration steps are completed
         if self.current_step >= 5:  # Total calibration steps
             # Process head movement thresholds
-            head_center = self.calibration_data[0]["head"]
-            ref_face_width = self.calibration_data[0]["face_width"]
-            
-            self.head_movement_tolerance = abs(self.calibration_data[2]["head"][0] - self.calibration_data[1]["head"][0]) // 2
-            self.face_rotation_threshold_left = abs(self.calibration_data[2]["face_width"] - ref_face_width) // 2
-            self.face_rotation_threshold_right = self.face_rotation_threshold_left
-            self.face_rotation_threshold_up = abs(self.calibration_data[3]["head"][1] - head_center[1]) // 2
-            self.face_rotation_threshold_down = abs(self.calibration_data[4]["head"][1] - head_center[1]) // 2
+            self.compute_head_thresholds()
             
             # Process iris calibration data
             for key in ["center", "left", "right"]:
@@ -200,9 +294,54 @@ class CheatingDetector:
                 "total_steps": 5
             }
 
-    def process_frame(self, img_data):
+    def compute_head_thresholds(self):
+        """Derive head movement and rotation thresholds from the calibration data"""
+        head_center = self.calibration_data[0]["head"]
+        ref_face_width = self.calibration_data[0]["face_width"]
+        
+        self.head_movement_tolerance = abs(self.calibration_data[2]["head"][0] - self.calibration_data[1]["head"][0]) // 2
+        self.face_rotation_threshold_left = abs(self.calibration_data[2]["face_width"] - ref_face_width) // 2
+        self.face_rotation_threshold_right = self.face_rotation_threshold_left
+        self.face_rotation_threshold_up = abs(self.calibration_data[3]["head"][1] - head_center[1]) // 2
+        self.face_rotation_threshold_down = abs(self.calibration_data[4]["head"][1] - head_center[1]) // 2
+
+    def export_calibration(self):
+        """Return the completed calibration as a JSON-serializable profile"""
+        if not self.calibrated:
+            raise ValueError("Detector is not calibrated")
+        
+        return {
+            "version": 1,
+            "calibration_data": {
+                str(step): {"head": list(data["head"]), "face_width": data["face_width"]}
+                for step, data in self.calibration_data.items()
+            },
+            "calibrated_positions": {
+                key: [right.tolist(), left.tolist()]
+                for key, (right, left) in self.calibrated_positions.items()
+            }
+        }
+
+    def load_calibration(self, profile):
+        """Restore a calibration produced by export_calibration; the detector is unchanged if it is invalid"""
+        self.calibration_data, self.calibrated_positions = parse_calibration(profile)
+        self.compute_head_thresholds()
+        self.current_step = len(self.calibration_data)
+        self.calibrated = True
+
+    def process_frame(self, img_data, annotate=None, timestamp=None):
         """
-        Process a frame from base64 image data and detect cheating
+        Process a frame from a base64 data URL or raw encoded image bytes and
+        detect cheating.
+
+        `timestamp` is the frame's capture time in seconds. Every timer (eye
+        closure, sustained eye up/down) runs on these timestamps, so frames
+        can be queued, batched or replayed at any speed with the same
+        results; without one the current time is used.
+
+        With annotate=False (or self.annotate False when annotate is None) no
+        overlays are drawn and no frame is re-encoded; only the alerts and the
+        numeric signals are returned.
         """
         if not self.calibrated:
             return {
@@ -210,48 +349,165 @@ class CheatingDetector:
                 "message": "Not calibrated. Please complete calibration first."
             }
         
-        # Decode image data
-        encoded_data = img_data.split(',')[1]
-        nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        clock = self.stage_clock()
+        buffer = decode_payload(img_data)
+        clock.lap("b64decode")
+        frame = decode_buffer(buffer)
+        clock.lap("imdecode")
+        if frame is None:
+            return {
+                "status": "error",
+                "message": "Could not decode image data"
+            }
+        if timestamp is None:
+            timestamp = time.time()
+        if self.frame_sink is not None:
+            self.frame_sink(frame, timestamp)
+            clock.skip()
+        return self.analyze_frame(frame, annotate=annotate, clock=clock, timestamp=timestamp)
+
+    def analyze_frame(self, frame, annotate=None, clock=None, timestamp=None):
+        """Detect cheating in an already decoded BGR frame captured at `timestamp` seconds"""
+        return self._analyze(frame, annotate=annotate, clock=clock, timestamp=timestamp)
+
+    def analyze_landmarks(self, landmarks, width, height, timestamp=None, frame=None):
+        """
+        Detect cheating from landmarks computed on the client (e.g. by the
+        MediaPipe web runtime) for a width x height frame. `landmarks` is an
+        (N, 2) or (N, 3) array of normalized coordinates, or None if the client
+        found no face. Results only; nothing is drawn or encoded.
+
+        Without a frame the head, EAR and iris checks run on the client's
+        landmarks; the pupil checks need pixels, so they are skipped and their
+        counters are left as they are. When `frame` is given (a spot check),
+        the server runs its own landmarker on it, compares the result with the
+        client's landmarks and analyzes the frame with the server's landmarks.
+        """
+        coords = None if landmarks is None else np.asarray(landmarks, dtype=float)[:, :2]
+        if frame is None:
+            result = self._analyze(None, coords=coords, infer=False, size=(width, height),
+                                   annotate=False, timestamp=timestamp)
+            checked = False
+        else:
+            server_coords = self.landmarker.detect(frame)
+            result = self._analyze(frame, coords=server_coords, infer=False, annotate=False,
+                                   timestamp=timestamp)
+            checked = True
+        
+        if self.landmark_check is not None and result["status"] != "error":
+            if checked:
+                deviation = self.landmark_check.verify(coords, server_coords)
+                result["signals"]["landmark_deviation"] = deviation
+            else:
+                self.landmark_check.skip()
+            result["spot_check"] = self.landmark_check.due()
+            integrity_alert = self.landmark_check.failed()
+            result["alerts"]["landmarks"] = integrity_alert
+            result["messages"].append("Landmarks: " + ("LANDMARK INTEGRITY ALERT!" if integrity_alert else "Landmarks OK"))
+            if integrity_alert:
+                result["cheating_detected"] = True
+        return result
+
+    def _analyze(self, frame, coords=None, infer=True, size=None, annotate=None, clock=None, timestamp=None):
+        """
+        Shared analysis for analyze_frame and analyze_landmarks. With infer the
+        landmarker runs on the frame; otherwise `coords` are used as given.
+        Without a frame (size is then (width, height)) the pixel-based checks
+        are skipped.
+        """
+        if annotate is None:
+            annotate = self.annotate
+        if clock is None:
+            clock = self.stage_clock()
+        if timestamp is None:
+            timestamp = time.time()
         
-        h, w, _ = frame.shape
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_frame)
+        if not self.calibrated:
+            return {
+                "status": "error",
+                "message": "Not calibrated. Please complete calibration first."
+            }
+        
+        # Frame time never runs backwards, so a late out-of-order frame
+        # cannot produce negative durations
+        if self.last_frame_time is not None and timestamp < self.last_frame_time:
+            timestamp = self.last_frame_time
+        self.last_frame_time = timestamp
+        now = timestamp
+        
+        if frame is not None:
+            h, w, _ = frame.shape
+        else:
+            w, h = size
+        # Normalized (N, 2) landmark array, or None if no face was found
+        if infer:
+            if self.motion_gate is not None:
+                coords = self.motion_gate.detect(self.landmarker, frame, now)
+            else:
+                coords = self.landmarker.detect(frame)
+            clock.lap("inference")
         
         # Initialize alert messages
         head_alert = "Head OK"
         eye_lr_alert = "Eye LR OK"
         eye_ud_alert = "Eye UD OK"
         eye_oc_alert = "Eye OC OK"
+        faces_alert = "Faces OK"
+        iris_alert = False
         
         cheating_detected = False
         
-        if not results.multi_face_landmarks:
-            # Return result with base64 image
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame_base64 = base64.b64encode(buffer).decode('utf-8')
-            
-            return {
+        # Numeric signals behind each alert
+        signals = {
+            "head_offset": None,
+            "face_width_delta": None,
+            "ear": {"left": None, "right": None},
+            "pupil_offset": {"lr": None, "ud": None},
+            "pupils": {"left": None, "right": None},
+            "iris_deviation": None,
+            "face_count": None
+        }
+        
+        # -------------- Second Person Detection --------------
+        if self.face_check is not None and frame is not None:
+            face_count = self.face_check.count(self.landmarker, frame, coords is not None)
+            signals["face_count"] = face_count
+            if face_count > 1:
+                faces_alert = "MULTIPLE FACES ALERT!"
+                cheating_detected = True
+            clock.lap("face_count")
+        
+        if coords is None:
+            result = {
                 "status": "no_face",
-                "cheating_detected": False,
-                "frame": f"data:image/jpeg;base64,{frame_base64}",
-                "messages": ["No face detected"]
+                "cheating_detected": cheating_detected,
+                "messages": ["No face detected"],
+                "alerts": {"multi_face": "ALERT" in faces_alert},
+                "signals": signals
             }
-        
-        face_landmarks = results.multi_face_landmarks[0]
-        
-        # Convert landmarks to dictionary for easier access
-        landmarks_dict = {idx: (int(lm.x * w), int(lm.y * h))
-                         for idx, lm in enumerate(face_landmarks.landmark)}
+            if self.face_check is not None and frame is not None:
+                result["messages"].append("Faces: " + faces_alert)
+            if annotate:
+                # Return result with base64 image
+                ret, buffer = cv2.imencode('.jpg', frame)
+                frame_base64 = base64.b64encode(buffer).decode('utf-8')
+                result["frame"] = f"data:image/jpeg;base64,{frame_base64}"
+                clock.lap("encode")
+            return result
+        
+        # Integer pixel coordinates of every landmark
+        pts = (coords * (w, h)).astype(int)
         
         # -------------- Head Movement Detection --------------
-        head_x, head_y = landmarks_dict[self.nose_landmark]
-        face_width = abs(landmarks_dict[self.left_face_landmark][0] - landmarks_dict[self.right_face_landmark][0])
+        head_x, head_y = pts[self.nose_landmark].tolist()
+        face_width = abs(int(pts[self.left_face_landmark, 0] - pts[self.right_face_landmark, 0]))
         
         head_center = self.calibration_data[0]["head"]
         ref_face_width = self.calibration_data[0]["face_width"]
         
+        signals["head_offset"] = [int(head_x - head_center[0]), int(head_y - head_center[1])]
+        signals["face_width_delta"] = int(face_width - ref_face_width)
+        
         # Check if head position is within allowed range
         head_movement_allowed = (
             (head_center[0] - self.head_movement_tolerance < head_x < head_center[0] + self.head_movement_tolerance) and
@@ -267,99 +523,68 @@ class CheatingDetector:
         if not head_movement_allowed and (face_rotation_left or face_rotation_right or face_rotation_up or face_rotation_down):
             head_alert = "HEAD CHEATING ALERT!"
             cheating_detected = True
+        clock.lap("head")
+        
+        # -------------- Pupil Localization --------------
+        # Both pupils, sub-pixel (x, y) in frame pixels or None
+        left_eye = pts[self.left_eye_landmarks]
+        right_eye = pts[self.right_eye_landmarks]
+        left_pupil = right_pupil = None
+        if frame is not None:
+            left_pupil, right_pupil = self.pupils.analyze(frame, left_eye, right_eye)
+            signals["pupils"] = {
+                "left": [round(v, 2) for v in left_pupil] if left_pupil is not None else None,
+                "right": [round(v, 2) for v in right_pupil] if right_pupil is not None else None
+            }
+            if annotate:
+                for pupil in (left_pupil, right_pupil):
+                    if pupil is not None:
+                        cv2.circle(frame, (int(pupil[0]), int(pupil[1])), 2, (0, 0, 255), -1)
+        clock.lap("pupils")
         
         # -------------- Eye Left/Right Movement Detection --------------
-        left_eye_points = []
-        for idx in self.left_eye_landmarks:
-            left_eye_points.append(landmarks_dict[idx])
-        
-        if left_eye_points:
-            x_coords = [p[0] for p in left_eye_points]
-            y_coords = [p[1] for p in left_eye_points]
-            min_x, max_x = min(x_coords), max(x_coords)
-            min_y, max_y = min(y_coords), max(y_coords)
-            padding = 5
-            roi_top = max(0, min_y - padding)
-            roi_bottom = min(h, max_y + padding)
-            roi_left = max(0, min_x - padding)
-            roi_right = min(w, max_x + padding)
-            eye_roi_lr = frame[roi_top:roi_bottom, roi_left:roi_right]
-            
-            if eye_roi_lr.size != 0:
-                gray_eye = cv2.cvtColor(eye_roi_lr, cv2.COLOR_BGR2GRAY)
-                _, thresh_eye = cv2.threshold(gray_eye, 50, 255, cv2.THRESH_BINARY_INV)
-                contours, _ = cv2.findContours(thresh_eye, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                
-                if contours:
-                    c = max(contours, key=cv2.contourArea)
-                    M = cv2.moments(c)
-                    if M["m00"] != 0:
-                        pupil_x_roi = int(M["m10"] / M["m00"])
-                        pupil_y_roi = int(M["m01"] / M["m00"])
-                        cv2.circle(eye_roi_lr, (pupil_x_roi, pupil_y_roi), 2, (0, 0, 255), -1)
-                        
-                        pupil_x_global = roi_left + pupil_x_roi
-                        eye_center_x = (min_x + max_x) // 2
-                        eye_width = max_x - min_x
-                        EXTREME_THRESHOLD_LR = 0.2 * (eye_width / 2)
-                        
-                        dist_from_center = abs(pupil_x_global - eye_center_x)
-                        if dist_from_center > EXTREME_THRESHOLD_LR:
-                            self.left_frames_outside += 1
-                        else:
-                            self.left_frames_outside = 0
-                            
-                        if self.left_frames_outside > self.frames_threshold_lr:
-                            eye_lr_alert = "EYE LR CHEATING ALERT!"
-                            cheating_detected = True
+        min_x, _ = left_eye.min(axis=0).tolist()
+        max_x, _ = left_eye.max(axis=0).tolist()
+        
+        if left_pupil is not None:
+            eye_center_x = (min_x + max_x) // 2
+            eye_width = max_x - min_x
+            EXTREME_THRESHOLD_LR = 0.2 * (eye_width / 2)
+        
+            signals["pupil_offset"]["lr"] = round(left_pupil[0] - eye_center_x, 2)
+            dist_from_center = abs(left_pupil[0] - eye_center_x)
+            if dist_from_center > EXTREME_THRESHOLD_LR:
+                self.left_frames_outside += 1
+            else:
+                self.left_frames_outside = 0
+        
+            if self.left_frames_outside > self.frames_threshold_lr:
+                eye_lr_alert = "EYE LR CHEATING ALERT!"
+                cheating_detected = True
+        clock.lap("eye_lr")
         
         # -------------- Eye Up/Down Movement Detection --------------
-        right_eye_points = []
-        for idx in self.right_eye_landmarks:
-            right_eye_points.append(landmarks_dict[idx])
-        
-        if right_eye_points:
-            x_coords = [p[0] for p in right_eye_points]
-            y_coords = [p[1] for p in right_eye_points]
-            min_x, max_x = min(x_coords), max(x_coords)
-            min_y, max_y = min(y_coords), max(y_coords)
-            padding = 5
-            roi_top = max(0, min_y - padding)
-            roi_bottom = min(h, max_y + padding)
-            roi_left = max(0, min_x - padding)
-            roi_right = min(w, max_x + padding)
-            eye_roi_ud = frame[roi_top:roi_bottom, roi_left:roi_right]
-            
-            # Dynamic threshold based on eye height
-            eye_height = max_y - min_y
-            EXTREME_THRESHOLD_UD = eye_height * 0.75  #0.25
-            
-            pupil_detected = False
-            if eye_roi_ud.size != 0:
-                gray_eye_ud = cv2.cvtColor(eye_roi_ud, cv2.COLOR_BGR2GRAY)
-                _, thresh_eye_ud = cv2.threshold(gray_eye_ud, 50, 255, cv2.THRESH_BINARY_INV)
-                contours, _ = cv2.findContours(thresh_eye_ud, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                
-                if contours:
-                    c = max(contours, key=cv2.contourArea)
-                    M = cv2.moments(c)
-                    if M["m00"] != 0:
-                        pupil_x_roi = int(M["m10"] / M["m00"])
-                        pupil_y_roi = int(M["m01"] / M["m00"])
-                        cv2.circle(eye_roi_ud, (pupil_x_roi, pupil_y_roi), 2, (0, 0, 255), -1)
-                        
-                        pupil_x_global = roi_left + pupil_x_roi
-                        pupil_y_global = roi_top + pupil_y_roi
-                        eye_center_y = (min_y + max_y) // 2
-                        
-                        dist_from_center_ud = abs(pupil_y_global - eye_center_y)
-                        pupil_detected = True
-                        
-                        if dist_from_center_ud > EXTREME_THRESHOLD_UD:
-                            self.right_frames_outside += 1
-                        else:
-                            self.right_frames_outside = 0
-            
+        _, min_y = right_eye.min(axis=0).tolist()
+        _, max_y = right_eye.max(axis=0).tolist()
+        
+        # Dynamic threshold based on eye height
+        eye_height = max_y - min_y
+        EXTREME_THRESHOLD_UD = eye_height * 0.75  #0.25
+        
+        pupil_detected = right_pupil is not None
+        if pupil_detected:
+            eye_center_y = (min_y + max_y) // 2
+        
+            signals["pupil_offset"]["ud"] = round(right_pupil[1] - eye_center_y, 2)
+            dist_from_center_ud = abs(right_pupil[1] - eye_center_y)
+        
+            if dist_from_center_ud > EXTREME_THRESHOLD_UD:
+                self.right_frames_outside += 1
+            else:
+                self.right_frames_outside = 0
+        
+        # Without pixels there is no pupil measurement; keep the counters as they are
+        if frame is not None:
             if not pupil_detected:
                 self.frames_no_pupil_ud += 1
             else:
@@ -367,30 +592,27 @@ class CheatingDetector:
             
             if self.right_frames_outside > self.frames_threshold_ud or self.frames_no_pupil_ud > self.frames_threshold_ud:
                 if self.cheat_start_time_ud is None:
-                    self.cheat_start_time_ud = time.time()
+                    self.cheat_start_time_ud = now
                 else:
-                    elapsed_ud = time.time() - self.cheat_start_time_ud
+                    elapsed_ud = now - self.cheat_start_time_ud
                     if elapsed_ud >= 1.0:  # Using 1 second threshold as in original
                         eye_ud_alert = "EYE UD CHEATING ALERT!"
                         cheating_detected = True
             else:
                 self.cheat_start_time_ud = None
+        clock.lap("eye_ud")
         
         # -------------- Eye Open/Close Detection --------------
-        # Build list of landmark coordinates for EAR calculation
-        landmarks_oc = []
-        for lm in face_landmarks.landmark:
-            landmarks_oc.append((int(lm.x * w), int(lm.y * h)))
-        
-        left_EAR = self.compute_EAR(self.left_ear_landmarks, landmarks_oc)
-        right_EAR = self.compute_EAR(self.right_ear_landmarks, landmarks_oc)
+        left_EAR = self.compute_EAR(self.left_ear_landmarks, pts)
+        right_EAR = self.compute_EAR(self.right_ear_landmarks, pts)
+        signals["ear"] = {"left": float(left_EAR), "right": float(right_EAR)}
         
         # Process left eye
         if left_EAR < self.ear_threshold:
             if self.left_eye_closed_start_time is None:
-                self.left_eye_closed_start_time = time.time()
+                self.left_eye_closed_start_time = now
             else:
-                elapsed_left = time.time() - self.left_eye_closed_start_time
+                elapsed_left = now - self.left_eye_closed_start_time
                 if elapsed_left > self.eye_closed_time_limit:
                     self.left_cheating_detected = True
         else:
@@ -400,9 +622,9 @@ class CheatingDetector:
         # Process right eye
         if right_EAR < self.ear_threshold:
             if self.right_eye_closed_start_time is None:
-                self.right_eye_closed_start_time = time.time()
+                self.right_eye_closed_start_time = now
             else:
-                elapsed_right = time.time() - self.right_eye_closed_start_time
+                elapsed_right = now - self.right_eye_closed_start_time
                 if elapsed_right > self.eye_closed_time_limit:
                     self.right_cheating_detected = True
         else:
@@ -413,9 +635,10 @@ class CheatingDetector:
         if self.left_cheating_detected or self.right_cheating_detected:
             eye_oc_alert = "EYE OC CHEATING ALERT!"
             cheating_detected = True
+        clock.lap("ear")
         
         # -------------- Iris Tracking (from target format) --------------
-        right_iris, left_iris = self.get_iris_center(face_landmarks, w, h)
+        right_iris, left_iris = self.get_iris_center(coords, w, h)
         
         # Apply smoothing to iris positions
         self.smoothed_right_iris = self.smooth_position(right_iris, self.smoothed_right_iris)
@@ -423,8 +646,9 @@ class CheatingDetector:
         
         # Draw smoothed iris positions for visualization
         if self.smoothed_right_iris is not None and self.smoothed_left_iris is not None:
-            cv2.circle(frame, tuple(self.smoothed_right_iris.astype(int)), 3, (0, 255, 0), -1)
-            cv2.circle(frame, tuple(self.smoothed_left_iris.astype(int)), 3, (0, 255, 0), -1)
+            if annotate:
+                cv2.circle(frame, tuple(self.smoothed_right_iris.astype(int)), 3, (0, 255, 0), -1)
+                cv2.circle(frame, tuple(self.smoothed_left_iris.astype(int)), 3, (0, 255, 0), -1)
             
             # Only check if we have calibration data
             if "center" in self.calibrated_positions and self.calibrated_positions["center"][0] is not None:
@@ -446,18 +670,23 @@ class CheatingDetector:
                     deviation = abs(current_eye[0] - average_eye_center[0])
                     # Allowed deviation: set as fraction of half the calibrated range
                     allowed_deviation = 0.8 * (average_eye_right[0] - average_eye_left[0]) / 2
+                    signals["iris_deviation"] = float(deviation)
                     
                     # Debug prints
-                    cv2.putText(frame, f"Eye Pos: {tuple(current_eye.astype(int))}", (50, 100),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                    cv2.putText(frame, f"Deviation: {deviation:.1f}", (50, 130),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                    if annotate:
+                        cv2.putText(frame, f"Eye Pos: {tuple(current_eye.astype(int))}", (50, 100),
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                        cv2.putText(frame, f"Deviation: {deviation:.1f}", (50, 130),
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
                     
                     # If deviation exceeds allowed range, flag cheating
                     if deviation > allowed_deviation:
+                        iris_alert = True
                         cheating_detected = True
-                        cv2.putText(frame, "Cheating (Eyes Too Far)!", (50, 80),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                        if annotate:
+                            cv2.putText(frame, "Cheating (Eyes Too Far)!", (50, 80),
+                                      cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        clock.lap("iris")
         
         # Display all alert messages
         alerts = [
@@ -466,24 +695,40 @@ class CheatingDetector:
             ("Eye UD: " + eye_ud_alert, (0, 0, 255) if "ALERT" in eye_ud_alert else (0, 255, 0)),
             ("Eye OC: " + eye_oc_alert, (0, 0, 255) if "ALERT" in eye_oc_alert else (0, 255, 0))
         ]
+        if self.face_check is not None and frame is not None:
+            alerts.append(("Faces: " + faces_alert, (0, 0, 255) if "ALERT" in faces_alert else (0, 255, 0)))
         
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.6
-        thickness = 2
-        start_y = 30
-        
-        for i, (text, color) in enumerate(alerts):
-            (w_text, h_text), _ = cv2.getTextSize(text, font, font_scale, thickness)
-            pos = (w - w_text - 10, start_y + i * (h_text + 10))
-            cv2.putText(frame, text, pos, font, font_scale, color, thickness)
-        
-        # Encode the frame with annotations back to base64
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        return {
+        result = {
             "status": "ok",
             "cheating_detected": cheating_detected,
-            "frame": f"data:image/jpeg;base64,{frame_base64}",
-            "messages": [alert[0] for alert in alerts]
-        }
\ No newline at end of file
+            "messages": [alert[0] for alert in alerts],
+            "alerts": {
+                "head": "ALERT" in head_alert,
+                "eye_lr": "ALERT" in eye_lr_alert,
+                "eye_ud": "ALERT" in eye_ud_alert,
+                "eye_oc": "ALERT" in eye_oc_alert,
+                "iris": iris_alert,
+                "multi_face": "ALERT" in faces_alert
+            },
+            "signals": signals
+        }
+        
+        if annotate:
+            font = cv2.FONT_HERSHEY_SIMPLEX
+            font_scale = 0.6
+            thickness = 2
+            start_y = 30
+            
+            for i, (text, color) in enumerate(alerts):
+                (w_text, h_text), _ = cv2.getTextSize(text, font, font_scale, thickness)
+                pos = (w - w_text - 10, start_y + i * (h_text + 10))
+                cv2.putText(frame, text, pos, font, font_scale, color, thickness)
+            clock.lap("annotate")
+            
+            # Encode the frame with annotations back to base64
+            ret, buffer = cv2.imencode('.jpg', frame)
+            frame_base64 = base64.b64encode(buffer).decode('utf-8')
+            result["frame"] = f"data:image/jpeg;base64,{frame_base64}"
+            clock.lap("encode")
+        
+        return result
\ No newline at end of file
@@ -0,0 +1,136 @@
+import logging
+import os
+import queue
+import threading
+from collections import deque
+
+import cv2
+
+from inference import downscale
+from timeline import AlertStates
+
+logger = logging.getLogger(__name__)
+
+
+class EvidenceRecorder:
+    """
+    Keeps the last few decoded frames of every session and saves JPEG
+    snapshots around the moment an alert begins.
+
+    Frames are held raw (downscaled to `max_side`) in a per-session ring of
+    `frames_before` frames. All rings together never hold more than
+    `max_bytes`; when the cap is hit the oldest frame across all sessions is
+    dropped. On an alert onset the ring and the next `frames_after` frames are
+    handed to a background thread, so cv2.imencode only ever runs for
+    evidence and never on the request path.
+
+    Snapshots are written to <directory>/<session_id>/<onset ms>_<signals>/<frame ms>.jpg.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, frames_before=3, frames_after=2,
+                 max_side=640, quality=85, max_pending=64):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.frames_before = frames_before
+        self.frames_after = frames_after
+        self.max_side = max_side
+        self.quality = quality
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._rings = {}  # session_id -> deque of (timestamp, frame)
+        self._captures = {}  # session_id -> [event directory, frames still to save]
+        self._bytes = 0
+        self._states = AlertStates()
+        self._jobs = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self.dropped_snapshots = 0
+
+    def start(self):
+        """Start the background encoder (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="evidence-encoder", daemon=True)
+            self._thread.start()
+
+    @property
+    def buffered_bytes(self):
+        return self._bytes
+
+    def add_frame(self, session_id, timestamp, frame):
+        """Buffer a decoded frame before it is analyzed (and possibly annotated)"""
+        small = downscale(frame, self.max_side)
+        # A frame that already fits is copied: the detector draws on it afterwards
+        frame = frame.copy() if small is frame else small
+
+        with self._lock:
+            ring = self._rings.get(session_id)
+            if ring is None:
+                ring = self._rings[session_id] = deque()
+            ring.append((timestamp, frame))
+            self._bytes += frame.nbytes
+            if len(ring) > self.frames_before:
+                self._bytes -= ring.popleft()[1].nbytes
+            while self._bytes > self.max_bytes:
+                self._evict_oldest()
+
+            capture = self._captures.get(session_id)
+            if capture is None:
+                return
+            capture[1] -= 1
+            if capture[1] <= 0:
+                del self._captures[session_id]
+            event_dir = capture[0]
+
+        self._submit(event_dir, timestamp, frame)
+
+    def _evict_oldest(self):
+        oldest = min((ring for ring in self._rings.values() if ring), key=lambda ring: ring[0][0])
+        self._bytes -= oldest.popleft()[1].nbytes
+
+    def record(self, session_id, timestamp, result):
+        """Save the buffered frames when result starts a new alert"""
+        if result.get("status") not in ("ok", "no_face"):
+            return
+        onsets, _ = self._states.update(session_id, result)
+        onsets.discard("no_face")
+        if not onsets:
+            return
+
+        self.start()
+        event_dir = os.path.join(self.directory, session_id,
+                                 f"{int(timestamp * 1000)}_{'+'.join(sorted(onsets))}")
+        with self._lock:
+            frames = list(self._rings.get(session_id, ()))
+            if self.frames_after > 0:
+                self._captures[session_id] = [event_dir, self.frames_after]
+        for frame_time, frame in frames:
+            self._submit(event_dir, frame_time, frame)
+
+    def drop(self, session_id):
+        """Free the buffered frames of an ended session"""
+        self._states.pop(session_id)
+        with self._lock:
+            ring = self._rings.pop(session_id, ())
+            self._bytes -= sum(frame.nbytes for _, frame in ring)
+            self._captures.pop(session_id, None)
+
+    def _submit(self, event_dir, timestamp, frame):
+        try:
+            self._jobs.put_nowait((event_dir, timestamp, frame))
+        except queue.Full:
+            self.dropped_snapshots += 1
+
+    def _run(self):
+        while True:
+            event_dir, timestamp, frame = self._jobs.get()
+            try:
+                ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if not ok:
+                    raise ValueError("JPEG encoding failed")
+                os.makedirs(event_dir, exist_ok=True)
+                with open(os.path.join(event_dir, f"{int(timestamp * 1000)}.jpg"), "wb") as f:
+                    f.write(buffer)
+            except Exception as e:
+                logger.error(f"Error saving evidence snapshot: {str(e)}")
@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from inference import InferenceBusy
+
+
+class DetectionExecutor:
+    """
+    Runs CPU-bound detection work off the HTTP threads.
+
+    At most `max_workers` tasks run at once and at most `max_pending` more may
+    wait; beyond that `run` raises InferenceBusy immediately, so request threads
+    never pile up behind detection and lightweight endpoints such as /health and
+    /status always have a thread to run on.
+    """
+
+    def __init__(self, max_workers, max_pending=None, timeout=30.0):
+        if max_pending is None:
+            max_pending = max_workers * 2
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="detect")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._in_flight = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def in_flight(self):
+        """Number of tasks running or waiting to run"""
+        return self._in_flight
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the executor and wait for its result"""
+        if not self._slots.acquire(blocking=False):
+            raise InferenceBusy("Detection queue is full, please retry")
+
+        with self._count_lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise InferenceBusy("Detection timed out, please retry")
+
+    def _done(self, future):
+        with self._count_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,179 @@
+import cv2
+import numpy as np
+
+from inference import downscale
+
+
+class MotionGate:
+    """
+    Decides per frame whether a session needs a fresh landmark pass.
+
+    The region around the face found by the last inferred frame (the whole
+    frame if there was no face) is reduced to a small grayscale thumbnail and
+    compared with the same region of the last inferred frame. The previous
+    landmarks are reused while both the mean and the largest per-cell
+    difference stay below their thresholds; the peak check catches gaze
+    shifts, which only change a few cells around the eyes. A fresh pass is
+    forced after `max_skip` consecutive reuses or `max_age` seconds of frame
+    time.
+    """
+
+    def __init__(self, threshold=2.0, peak_threshold=16.0, max_skip=5, max_age=1.0,
+                 thumb_size=(48, 48), margin=0.1):
+        self.threshold = threshold  # mean absolute difference, in gray levels
+        self.peak_threshold = peak_threshold  # largest cell difference, in gray levels
+        self.max_skip = max_skip
+        self.max_age = max_age  # seconds
+        self.thumb_size = thumb_size  # (width, height)
+        self.margin = margin  # padding around the face box, as a fraction of its size
+        self.region = None  # (x0, y0, x1, y1) in normalized coordinates
+        self.thumb = None  # thumbnail of the region in the last inferred frame
+        self.coords = None  # landmarks of the last inferred frame
+        self.inferred_at = None
+        self.skip_run = 0
+        self.last_skipped = False
+        self.inferred_frames = 0
+        self.skipped_frames = 0
+
+    def detect(self, landmarker, frame, now):
+        """Landmarks for a frame captured at `now` seconds, reused or from a fresh landmarker pass"""
+        if (self.thumb is not None
+                and self.skip_run < self.max_skip
+                and now - self.inferred_at < self.max_age
+                and self._is_static(self._thumbnail(frame, self.region))):
+            self.skip_run += 1
+            self.skipped_frames += 1
+            self.last_skipped = True
+            return self.coords
+
+        coords = landmarker.detect(frame)
+        self.region = self._face_region(coords)
+        self.thumb = self._thumbnail(frame, self.region)
+        self.coords = coords
+        self.inferred_at = now
+        self.skip_run = 0
+        self.inferred_frames += 1
+        self.last_skipped = False
+        return coords
+
+    def reset(self):
+        """Force a fresh pass on the next frame, e.g. after recalibration"""
+        self.thumb = None
+        self.coords = None
+        self.region = None
+
+    def _is_static(self, thumb):
+        if thumb is None or thumb.shape != self.thumb.shape:
+            return False
+        diff = cv2.absdiff(thumb, self.thumb)
+        return diff.mean() < self.threshold and diff.max() < self.peak_threshold
+
+    def _face_region(self, coords):
+        if coords is None:
+            return None
+        (x0, y0), (x1, y1) = coords.min(axis=0), coords.max(axis=0)
+        pad = self.margin * max(x1 - x0, y1 - y0)
+        return (max(0.0, x0 - pad), max(0.0, y0 - pad), min(1.0, x1 + pad), min(1.0, y1 + pad))
+
+    def _thumbnail(self, frame, region):
+        if region is not None:
+            h, w = frame.shape[:2]
+            x0, y0, x1, y1 = region
+            frame = frame[int(y0 * h):int(y1 * h) + 1, int(x0 * w):int(x1 * w) + 1]
+            if frame.size == 0:
+                return None
+        small = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+class FaceCountCheck:
+    """
+    Runs the landmarker's lightweight face detector at a low cadence to spot a
+    second person in view, instead of asking FaceMesh for several faces on
+    every frame.
+
+    The count is refreshed every `interval` frames and immediately whenever
+    FaceMesh gains or loses the face; in between, the last count is reused.
+    Counting runs on a copy downscaled to `max_side`, which is plenty for a
+    face detector and keeps the extra pass to a few milliseconds.
+    """
+
+    def __init__(self, interval=10, max_side=320):
+        self.interval = interval
+        self.max_side = max_side
+        self.faces = None  # faces found by the last check
+        self.frames_since = 0
+        self.face_found = None  # whether FaceMesh found a face on the previous frame
+        self.checks = 0
+
+    def count(self, landmarker, frame, face_found):
+        """Number of faces in view, refreshed when the schedule says so"""
+        self.frames_since += 1
+        if self.faces is None or self.frames_since >= self.interval or face_found != self.face_found:
+            self.faces = landmarker.count_faces(downscale(frame, self.max_side))
+            self.frames_since = 0
+            self.checks += 1
+        self.face_found = face_found
+        return self.faces
+
+    def reset(self):
+        """Force a fresh count on the next frame"""
+        self.faces = None
+        self.face_found = None
+
+
+class LandmarkSpotCheck:
+    """
+    Integrity check for sessions that submit landmarks computed on the client.
+
+    Every `interval` landmark submissions the client is asked (via the
+    `spot_check` flag in the result) to include the full frame. The server's
+    own landmarks for that frame are compared with the client's; a mean
+    distance above `tolerance` (as a fraction of the face size), or a face
+    only one side found, fails the check. The session stays flagged until a
+    later spot check passes, and also while a requested check is more than
+    `grace` submissions overdue.
+    """
+
+    def __init__(self, interval=30, tolerance=0.05, grace=None):
+        self.interval = interval
+        self.tolerance = tolerance
+        self.grace = grace if grace is not None else interval
+        self.since_check = interval  # ask for a check on the first submission
+        self.last_failed = False
+        self.checks = 0
+        self.failures = 0
+
+    def due(self):
+        """Whether the next submission should include the full frame"""
+        return self.since_check >= self.interval
+
+    def failed(self):
+        """Whether the session's landmarks are currently untrusted"""
+        return self.last_failed or self.since_check >= self.interval + self.grace
+
+    def skip(self):
+        """Count a submission that came without a frame"""
+        self.since_check += 1
+
+    def verify(self, client_coords, server_coords):
+        """Compare both landmark sets for one frame; returns the relative deviation or None"""
+        self.since_check = 0
+        self.checks += 1
+
+        if client_coords is None or server_coords is None:
+            deviation = None
+            passed = client_coords is None and server_coords is None
+        elif client_coords.shape != server_coords.shape:
+            deviation = None
+            passed = False
+        else:
+            face_size = float(np.linalg.norm(server_coords.max(axis=0) - server_coords.min(axis=0)))
+            distance = float(np.linalg.norm(client_coords - server_coords, axis=1).mean())
+            deviation = distance / face_size if face_size > 0 else None
+            passed = deviation is not None and deviation <= self.tolerance
+
+        self.last_failed = not passed
+        if not passed:
+            self.failures += 1
+        return deviation
@@ -0,0 +1,38 @@
+# Gunicorn settings for the production server:
+#   gunicorn -c gunicorn.conf.py main:app
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Sessions live in process memory, so run a single web process and scale with
+# threads. FaceMesh runs in the inference worker processes and the rest of the
+# detection work runs on the detection executor (see main.py).
+workers = int(os.environ.get('WEB_WORKERS', 1))
+worker_class = 'gthread'
+# Each open /ws/analyze stream holds a thread for its whole life, and each
+# session has at most one request in flight, so by default there is a thread
+# for every session plus WEB_RESERVED_THREADS that streams can never take
+# (main.py caps open streams at WEB_THREADS - WEB_RESERVED_THREADS), keeping
+# /health and /ready responsive with every session streaming
+reserved_threads = int(os.environ.get('WEB_RESERVED_THREADS', 32))
+threads = int(os.environ.get('WEB_THREADS', int(os.environ.get('MAX_SESSIONS', 500)) + reserved_threads))
+if threads <= reserved_threads:
+    raise ValueError(f"WEB_THREADS ({threads}) must exceed WEB_RESERVED_THREADS ({reserved_threads})")
+
+# Calibration profiles kept by browsers are signed with PROFILE_SIGNING_KEY and
+# must still verify after a restart or on another node, so the production
+# server refuses the per-process random key main.py falls back to
+if not os.environ.get('PROFILE_SIGNING_KEY'):
+    raise ValueError("PROFILE_SIGNING_KEY must be set to a secret shared by every node")
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+accesslog = os.environ.get('ACCESS_LOG', None)
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+
+def post_worker_init(worker):
+    """Start the inference workers once the app is loaded in this process"""
+    import main
+    main.start_background_services()
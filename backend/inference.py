@@ -0,0 +1,578 @@
+import cv2
+import numpy as np
+import itertools
+import logging
+import math
+import multiprocessing
+import queue
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from shared_frames import FrameSlots, shm_free_bytes
+
+logger = logging.getLogger(__name__)
+
+# Default number of shared memory frame slots per worker: one for the frame
+# being processed and one queued behind it; further frames are pickled
+SLOTS_PER_WORKER = 2
+# Share of the free shared memory the frame slots may take
+SHM_SHARE = 0.5
+
+# Frame run through new graphs so model loading and allocation happen before
+# the first real frame
+WARMUP_FRAME = np.zeros((480, 640, 3), np.uint8)
+
+def _mediapipe():
+    # Imported on first use: loading MediaPipe takes seconds, and a web process
+    # that hands inference to a pool never needs it
+    import mediapipe
+    return mediapipe
+
+def create_face_mesh():
+    """Build a FaceMesh graph with the settings used for proctoring"""
+    return _mediapipe().solutions.face_mesh.FaceMesh(
+        static_image_mode=False,
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+def create_face_detector():
+    """Build the lightweight short-range face detector used to count faces in view"""
+    return _mediapipe().solutions.face_detection.FaceDetection(
+        model_selection=0,
+        min_detection_confidence=0.6
+    )
+
+def landmarks_to_array(face_landmarks):
+    """
+    Convert MediaPipe landmarks into a single (N, 2) array of normalized x, y
+    coordinates. This is the only per-landmark Python loop; every measure is
+    computed from the array with vectorized indexing.
+    """
+    return np.array([(lm.x, lm.y) for lm in face_landmarks.landmark])
+
+def downscale(frame, max_side):
+    """The frame resized (INTER_AREA) so its longest side is at most max_side; the frame itself if it already fits"""
+    h, w = frame.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return frame
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+def run_face_mesh(face_mesh, frame):
+    """Run FaceMesh on a BGR frame and return normalized landmarks, or None if no face"""
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    results = face_mesh.process(rgb_frame)
+    if not results.multi_face_landmarks:
+        return None
+    return landmarks_to_array(results.multi_face_landmarks[0])
+
+def run_face_count(face_detector, frame):
+    """Run the face detector on a BGR frame and return the number of faces found"""
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    results = face_detector.process(rgb_frame)
+    return len(results.detections) if results.detections else 0
+
+
+def create_warm_face_mesh():
+    """Build a FaceMesh graph and run a blank frame through it"""
+    face_mesh = create_face_mesh()
+    run_face_mesh(face_mesh, WARMUP_FRAME)
+    return face_mesh
+
+
+def graphs_per_worker(max_sessions, num_workers, graphs_per_session=1, spread=4.0):
+    """
+    Per-worker graph cap that holds every session's graphs without LRU
+    eviction. Sessions land on workers by hash, not evenly, so the even share
+    is padded by `spread` standard deviations of that (binomial) scatter.
+    """
+    even_share = math.ceil(max_sessions * graphs_per_session / num_workers)
+    return even_share + math.ceil(spread * math.sqrt(even_share))
+
+
+class InferenceBusy(RuntimeError):
+    """Raised when an inference worker's queue is full or a request timed out"""
+
+
+class WarmGraphs:
+    """
+    Spare FaceMesh graphs that are built and warmed ahead of demand, so a new
+    session's first frame does not pay for graph construction and warm-up.
+    take() falls back to building a cold graph when no spare is left.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._spares = []
+        self._lock = threading.Lock()
+        self._filling = False
+        self._filled = threading.Event()
+        if size <= 0:
+            self._filled.set()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._spares)
+
+    def fill(self, limit=None):
+        """Build spares until `size` are available, or at most `limit` new ones"""
+        built = 0
+        while len(self) < self.size and (limit is None or built < limit):
+            face_mesh = create_warm_face_mesh()
+            with self._lock:
+                self._spares.append(face_mesh)
+            built += 1
+        if len(self) >= self.size:
+            self._filled.set()
+
+    def refill_async(self):
+        """Top up the spares on a background thread unless one is already doing so"""
+        with self._lock:
+            if self._filling or len(self._spares) >= self.size:
+                return
+            self._filling = True
+
+        def run():
+            try:
+                self.fill()
+            except Exception as e:
+                logger.error(f"Error warming FaceMesh graphs: {str(e)}")
+            finally:
+                with self._lock:
+                    self._filling = False
+
+        threading.Thread(target=run, name="graph-warmer", daemon=True).start()
+
+    def ready(self):
+        """Whether the first fill has completed"""
+        return self._filled.is_set()
+
+    def take(self):
+        with self._lock:
+            if self._spares:
+                return self._spares.pop()
+        return create_face_mesh()
+
+    def close(self):
+        with self._lock:
+            spares, self._spares = self._spares, []
+        for face_mesh in spares:
+            face_mesh.close()
+
+
+class FaceMeshLandmarker:
+    """Runs FaceMesh in the calling thread with a graph owned by one detector"""
+
+    def __init__(self, face_mesh=None):
+        self.face_mesh = face_mesh if face_mesh is not None else create_face_mesh()
+        self.face_detector = None  # created on the first count_faces
+
+    def detect(self, frame):
+        return run_face_mesh(self.face_mesh, frame)
+
+    def count_faces(self, frame):
+        if self.face_detector is None:
+            self.face_detector = create_face_detector()
+        return run_face_count(self.face_detector, frame)
+
+    def close(self):
+        self.face_mesh.close()
+        if self.face_detector is not None:
+            self.face_detector.close()
+
+
+class PooledLandmarker:
+    """Sends one session's frames to its pinned worker in an InferencePool"""
+
+    def __init__(self, pool, session_id):
+        self.pool = pool
+        self.session_id = session_id
+
+    def detect(self, frame):
+        return self.pool.detect(self.session_id, frame)
+
+    def count_faces(self, frame):
+        return self.pool.count_faces(self.session_id, frame)
+
+    def close(self):
+        self.pool.release(self.session_id)
+
+
+class AdaptiveLandmarker:
+    """
+    Wraps another landmarker to cut per-frame CPU on large webcam frames.
+
+    Landmark detection runs on a downscaled copy of the frame. While a face is
+    being tracked, only a crop around the previous frame's face box is sent to
+    FaceMesh; a full-frame pass is made only when there is no previous box or
+    the face is lost in the crop. Landmarks are normalized, so they are mapped
+    back to full-frame coordinates and downstream measures are unchanged.
+
+    Crops go to their own `crop_landmarker` graph. FaceMesh in tracking mode
+    seeds each pass with the face region of its previous input, so sharing
+    one graph between full frames and crops would hand it a region from a
+    different coordinate frame after every switch. Each crop is centered on
+    the previous face box with a fixed margin, so in crop coordinates the face
+    stays near the middle at a near-constant scale and the crop graph can
+    keep tracking across passes; its region only goes stale after a full
+    pass, when the crop is re-centered anyway.
+    """
+
+    def __init__(self, landmarker, crop_landmarker=None, full_size=480, crop_size=256, margin=0.3):
+        self.landmarker = landmarker
+        # Falls back to sharing the full-frame graph, which loses tracking on every switch
+        self.crop_landmarker = crop_landmarker if crop_landmarker is not None else landmarker
+        self.full_size = full_size  # max side for full-frame passes
+        self.crop_size = crop_size  # max side for face-box crops
+        self.margin = margin  # padding around the face box, as a fraction of its size
+        self.face_box = None  # (x0, y0, x1, y1) in pixels of the previous frame
+        self.full_passes = 0
+        self.crop_passes = 0
+
+    def detect(self, frame):
+        h, w = frame.shape[:2]
+
+        if self.face_box is not None:
+            x0, y0, x1, y1 = self._expand(self.face_box, w, h)
+            coords = self._detect_scaled(self.crop_landmarker, frame[y0:y1, x0:x1], self.crop_size)
+            # Landmarks outside the crop mean the face is clipped; retry on the full frame
+            if coords is not None and coords.min() >= 0 and coords.max() <= 1:
+                coords = (coords * (x1 - x0, y1 - y0) + (x0, y0)) / (w, h)
+                self.crop_passes += 1
+                self._update_box(coords, w, h)
+                return coords
+
+        # No face box yet or tracking lost: full-frame pass
+        coords = self._detect_scaled(self.landmarker, frame, self.full_size)
+        self.full_passes += 1
+        if coords is None:
+            self.face_box = None
+        else:
+            self._update_box(coords, w, h)
+        return coords
+
+    def _detect_scaled(self, landmarker, image, max_side):
+        return landmarker.detect(downscale(image, max_side))
+
+    def count_faces(self, frame):
+        return self.landmarker.count_faces(frame)
+
+    def _update_box(self, coords, w, h):
+        x0, y0 = coords.min(axis=0) * (w, h)
+        x1, y1 = coords.max(axis=0) * (w, h)
+        self.face_box = (x0, y0, x1, y1)
+
+    def _expand(self, box, w, h):
+        x0, y0, x1, y1 = box
+        pad = self.margin * max(x1 - x0, y1 - y0)
+        return (max(0, int(x0 - pad)), max(0, int(y0 - pad)),
+                min(w, int(x1 + pad) + 1), min(h, int(y1 + pad) + 1))
+
+    def close(self):
+        self.landmarker.close()
+        if self.crop_landmarker is not self.landmarker:
+            self.crop_landmarker.close()
+
+
+def _worker_main(requests, results, max_graphs, warm_graphs, ready, slots_spec=None):
+    """
+    Inference worker loop. Keeps one FaceMesh graph per session (LRU-capped)
+    so tracking mode keeps working for every session pinned to this worker.
+    Face counting is stateless, so one face detector serves all sessions.
+
+    Before taking requests the worker builds `warm_graphs` warmed spare graphs
+    for new sessions and sets `ready`; spares are topped up while idle.
+
+    Frames arrive either pickled or, with `slots_spec`, as a (slot, shape)
+    reference into the pool's shared FrameSlots, read in place.
+    """
+    slots = None
+    if slots_spec is not None:
+        name, num_slots, max_width, max_height = slots_spec
+        slots = FrameSlots(num_slots, max_width, max_height, name=name)
+    graphs = OrderedDict()
+    spares = WarmGraphs(warm_graphs)
+    spares.fill()
+    face_detector = create_face_detector()
+    run_face_count(face_detector, WARMUP_FRAME)
+    ready.set()
+
+    while True:
+        # Top up one spare at a time so a new request never waits long
+        if requests.empty() and len(spares) < warm_graphs:
+            spares.fill(limit=1)
+        message = requests.get()
+        if message is None:
+            break
+
+        request_id, kind, session_id, frame = message
+        if isinstance(frame, tuple):
+            frame = slots.view(*frame)
+
+        if kind == "release":
+            face_mesh = graphs.pop(session_id, None)
+            if face_mesh is not None:
+                face_mesh.close()
+            continue
+
+        if kind == "faces":
+            try:
+                results.put((request_id, run_face_count(face_detector, frame), None))
+            except Exception as e:
+                results.put((request_id, None, str(e)))
+            continue
+
+        try:
+            face_mesh = graphs.pop(session_id, None)
+            if face_mesh is None:
+                face_mesh = spares.take()
+                if len(graphs) >= max_graphs:
+                    _, evicted = graphs.popitem(last=False)
+                    evicted.close()
+            graphs[session_id] = face_mesh
+
+            results.put((request_id, run_face_mesh(face_mesh, frame), None))
+        except Exception as e:
+            results.put((request_id, None, str(e)))
+
+    for face_mesh in graphs.values():
+        face_mesh.close()
+    spares.close()
+    face_detector.close()
+    if slots is not None:
+        slots.close()
+
+
+class InferencePool:
+    """
+    A pool of processes, each holding its own FaceMesh graphs, with a bounded
+    request queue in front of every worker. Sessions are pinned to a worker by
+    hashing their ID, and callers get InferenceBusy instead of waiting when the
+    worker's queue is full.
+
+    Frames up to `max_frame_size` (width, height) are passed through
+    `frame_slots` pre-allocated shared memory slots instead of being pickled
+    (by default SLOTS_PER_WORKER per worker; 0 disables). A slot is recycled
+    when its worker answers, and frames that find none free are pickled. At
+    start the slots are cut down to what fits in SHM_SHARE of the free shared
+    memory, so a small /dev/shm costs speed rather than crashing workers.
+
+    A supervisor thread respawns dead workers every `supervise_interval`
+    seconds, so a crash is repaired without waiting for a session pinned to
+    that worker. Once every worker has warmed up, the pool stays ready while
+    a replacement warms: its requests wait in its queue meanwhile.
+    """
+
+    def __init__(self, num_workers, queue_size=8, max_graphs_per_worker=64, timeout=10.0,
+                 warm_graphs_per_worker=2, frame_slots=None, max_frame_size=(1920, 1080),
+                 supervise_interval=1.0):
+        self.num_workers = num_workers
+        self.queue_size = queue_size
+        self.max_graphs_per_worker = max_graphs_per_worker
+        self.timeout = timeout
+        self.warm_graphs_per_worker = warm_graphs_per_worker
+        if frame_slots is None:
+            frame_slots = num_workers * min(queue_size, SLOTS_PER_WORKER)
+        self.frame_slots = frame_slots
+        self.max_frame_size = max_frame_size
+        self.supervise_interval = supervise_interval
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers = [None] * num_workers
+        self._queues = [None] * num_workers
+        self._ready = [None] * num_workers
+        self._results = None
+        self._slots = None
+        self._slot_of = {}  # request_id -> (worker index, slot) for frames in shared memory
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._warmed = False  # every worker has been ready at least once
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Spawn the worker processes and the result collector (idempotent)"""
+        with self._start_lock:
+            if self._started:
+                return
+            self._results = self._ctx.Queue()
+            self._slots = self._create_slots()
+            for index in range(self.num_workers):
+                self._spawn(index)
+            threading.Thread(target=self._collect, name="inference-results", daemon=True).start()
+            self._stopping = threading.Event()
+            threading.Thread(target=self._supervise, args=(self._stopping,),
+                             name="inference-supervisor", daemon=True).start()
+            self._started = True
+            logger.info(f"Started {self.num_workers} inference workers")
+
+    def _create_slots(self):
+        """As many of the configured frame slots as fit in shared memory, or None for none"""
+        num_slots = self.frame_slots
+        free = shm_free_bytes()
+        if num_slots > 0 and free is not None:
+            num_slots = min(num_slots, int(free * SHM_SHARE) // FrameSlots.slot_size(*self.max_frame_size))
+            if num_slots < self.frame_slots:
+                logger.warning(f"Only {num_slots} of {self.frame_slots} frame slots fit in the "
+                               f"{free / 2**20:.0f} MiB of free shared memory; other frames are pickled")
+        if num_slots <= 0:
+            return None
+        return FrameSlots(num_slots, *self.max_frame_size)
+
+    def _spawn(self, index):
+        self._queues[index] = self._ctx.Queue(maxsize=self.queue_size)
+        self._ready[index] = self._ctx.Event()
+        slots_spec = None
+        if self._slots is not None:
+            slots_spec = (self._slots.name, self._slots.num_slots,
+                          self._slots.max_width, self._slots.max_height)
+            # Frames handed to a dead worker will never be answered; recycle their slots
+            with self._pending_lock:
+                lost = [request_id for request_id, (owner, _) in self._slot_of.items() if owner == index]
+                for request_id in lost:
+                    self._slots.release(self._slot_of.pop(request_id)[1])
+        worker = self._ctx.Process(
+            target=_worker_main,
+            args=(self._queues[index], self._results, self.max_graphs_per_worker,
+                  self.warm_graphs_per_worker, self._ready[index], slots_spec),
+            name=f"inference-worker-{index}",
+            daemon=True
+        )
+        worker.start()
+        self._workers[index] = worker
+
+    def _collect(self):
+        while True:
+            request_id, value, error = self._results.get()
+            with self._pending_lock:
+                future = self._pending.pop(request_id, None)
+                slot = self._slot_of.pop(request_id, None)
+            if slot is not None:
+                self._slots.release(slot[1])
+            if future is None:
+                continue  # Caller already gave up on this request
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(value)
+
+    def worker_for(self, session_id):
+        """Index of the worker a session is pinned to"""
+        return zlib.crc32(session_id.encode("utf-8")) % self.num_workers
+
+    def ready(self):
+        """Whether every worker has warmed up and is running (dead ones are restarted first)"""
+        if not self._started:
+            return False
+        self._respawn_dead()
+        if not self._warmed:
+            self._warmed = all(event.is_set() for event in self._ready)
+        return self._warmed and all(worker.is_alive() for worker in self._workers)
+
+    def queue_depth(self):
+        """Total number of requests waiting across all workers"""
+        if not self._started:
+            return 0
+        return sum(q.qsize() for q in self._queues)
+
+    def detect(self, session_id, frame):
+        """Run FaceMesh for a session's frame on its worker and return the landmarks"""
+        return self._submit("detect", session_id, frame)
+
+    def count_faces(self, session_id, frame):
+        """Count the faces in a session's frame on its worker"""
+        return self._submit("faces", session_id, frame)
+
+    def _supervise(self, stopping):
+        while not stopping.wait(self.supervise_interval):
+            try:
+                self._respawn_dead()
+            except Exception as e:
+                logger.error(f"Error restarting inference workers: {str(e)}")
+
+    def _respawn_dead(self, indices=None):
+        """Restart the given (by default all) workers that have died"""
+        for index in range(self.num_workers) if indices is None else indices:
+            if self._workers[index].is_alive():
+                continue
+            with self._start_lock:
+                if self._started and not self._stopping.is_set() and not self._workers[index].is_alive():
+                    logger.error(f"Inference worker {index} died; restarting it")
+                    self._spawn(index)
+
+    def _submit(self, kind, session_id, frame):
+        self.start()
+        index = self.worker_for(session_id)
+        self._respawn_dead([index])
+
+        request_id = next(self._request_ids)
+        future = Future()
+        payload = frame
+        slot = None
+        if self._slots is not None and self._slots.fits(frame):
+            # With every slot in flight the frame is pickled like an oversized one
+            slot = self._slots.acquire()
+            if slot is not None:
+                payload = self._slots.write(slot, frame)
+
+        with self._pending_lock:
+            self._pending[request_id] = future
+            if slot is not None:
+                self._slot_of[request_id] = (index, slot)
+
+        try:
+            self._queues[index].put_nowait((request_id, kind, session_id, payload))
+        except queue.Full:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+                self._slot_of.pop(request_id, None)
+            if slot is not None:
+                self._slots.release(slot)
+            raise InferenceBusy("Inference queue is full, please retry")
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise InferenceBusy("Inference timed out, please retry")
+
+    def release(self, session_id):
+        """Drop the FaceMesh graph a worker keeps for a finished session"""
+        if not self._started:
+            return
+        try:
+            self._queues[self.worker_for(session_id)].put_nowait((None, "release", session_id, None))
+        except queue.Full:
+            pass  # The worker's LRU will evict the graph eventually
+
+    def close(self):
+        """Stop all worker processes"""
+        if not self._started:
+            return
+        # Taken so no restart is under way once the supervisor is told to stop
+        with self._start_lock:
+            self._stopping.set()
+        for q in self._queues:
+            try:
+                q.put(None, timeout=1)
+            except queue.Full:
+                pass
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        if self._slots is not None:
+            self._slots.close()
+            self._slots = None
+            self._slot_of.clear()
+        self._started = False
+        self._warmed = False
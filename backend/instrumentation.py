@@ -0,0 +1,52 @@
+import time
+from collections import defaultdict
+
+
+class StageClock:
+    """
+    Times consecutive stages of one frame. Each lap(stage) reports the time
+    since the previous lap (or since the clock was created) to the observer.
+    """
+
+    __slots__ = ("observer", "last")
+
+    def __init__(self, observer):
+        self.observer = observer
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.observer(stage, now - self.last)
+        self.last = now
+
+    def skip(self):
+        """Restart the clock without reporting, e.g. after untimed work"""
+        self.last = time.perf_counter()
+
+
+class NullClock:
+    """Stand-in clock used when no observer is attached; every call is a no-op"""
+
+    __slots__ = ()
+
+    def lap(self, stage):
+        pass
+
+    def skip(self):
+        pass
+
+
+NULL_CLOCK = NullClock()
+
+
+class StageRecorder:
+    """Observer that keeps every stage duration in memory (used by bench.py)"""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+
+    def __call__(self, stage, seconds):
+        self.durations[stage].append(seconds)
+
+    def clear(self):
+        self.durations.clear()
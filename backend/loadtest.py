@@ -0,0 +1,397 @@
+"""
+Load test for a backend node.
+
+Simulates a fleet of virtual candidates against a local server. Each one runs
+the real client flow: POST /calibration/start, five /calibration/step frames,
+then /analyze at a fixed frame rate for --duration seconds, and finally ends
+its session. The fleet is run once per concurrency level, and sustained
+throughput, error rate, dropped frames and latency percentiles are reported
+per level as JSON:
+
+    # Against a server that is already running
+    python loadtest.py --url http://127.0.0.1:5000 --concurrency 1,8,32 --fps 2
+
+    # Start a local gunicorn server for the run (extra settings come from the
+    # environment, e.g. INFERENCE_WORKERS=4 PIPELINE_MODE=adaptive)
+    python loadtest.py --spawn --face-frames recordings/frames/ --sla-ms 500
+
+Like the frontend, a candidate keeps at most one frame in flight. A frame that
+comes due while the previous request is still running is dropped, and a 503
+from the server's backpressure counts as rejected.
+
+Frames with a face come from --face-frames (recorded webcam images, resized to
+--resolution). Without them, synthetic noise frames are sent. These never
+calibrate, so candidates resume a synthetic calibration profile instead and
+only the no-face path is measured, as in bench.py. The server only resumes
+profiles it signed, so the profile is signed with PROFILE_SIGNING_KEY: --spawn
+sets it for the server it starts, and against a running server it must be set
+to that server's key.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+from bench import RESOLUTIONS, encode_payload, load_face_frames, summarize_ms, synthetic_frame, synthetic_profile
+from profiles import sign_profile
+
+
+class CandidateStats:
+    """What one virtual candidate saw during a run"""
+
+    def __init__(self):
+        self.calibration_latencies = []
+        self.latencies = []  # successful /analyze requests, in seconds
+        self.sent = 0
+        self.ok = 0
+        self.rejected = 0  # 503 backpressure responses
+        self.errors = 0  # any other failed request, including connection errors
+        self.resume_rejected = 0  # 403 from /calibration/resume: profile signed with another key
+        self.dropped = 0  # frames skipped while a request was in flight
+        self.statuses = {}
+        self.calibrated_via = None
+        self.started = None
+        self.finished = None
+
+
+class VirtualCandidate:
+    """One simulated exam client with its own keep-alive connection and session"""
+
+    def __init__(self, url, payloads, calibration_payload, profile, fps, duration, offset,
+                 annotate, timeout):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.payloads = payloads
+        self.calibration_payload = calibration_payload
+        self.profile = profile
+        self.fps = fps
+        self.duration = duration
+        self.offset = offset  # index of the first frame, so candidates do not send identical frames
+        self.annotate = annotate
+        self.timeout = timeout
+        self.session_id = None
+        self.conn = None
+        self.stats = CandidateStats()
+
+    def request(self, method, path, body=None):
+        """Send one request; returns (HTTP status, decoded JSON or None)"""
+        headers = {}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if self.session_id:
+            headers["X-Session-ID"] = self.session_id
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.conn.request(method, path, body=data, headers=headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next request
+            self.conn.close()
+            self.conn = None
+            raise
+        try:
+            return response.status, json.loads(raw)
+        except ValueError:
+            return response.status, None
+
+    def run(self, start_at):
+        time.sleep(max(0.0, start_at - time.time()))
+        try:
+            if self.calibrate():
+                self.analyze()
+        except (OSError, http.client.HTTPException):
+            self.stats.errors += 1
+        finally:
+            self.end()
+
+    def calibrate(self):
+        """Run the calibration flow; returns whether the session ended up calibrated"""
+        t0 = time.perf_counter()
+        status, result = self.request("POST", "/calibration/start", {"annotate": self.annotate})
+        self.stats.calibration_latencies.append(time.perf_counter() - t0)
+        if status != 200 or not result:
+            self.stats.errors += 1
+            return False
+        self.session_id = result["session_id"]
+
+        complete = False
+        for _ in range(5):
+            t0 = time.perf_counter()
+            status, result = self.request("POST", "/calibration/step", {"image": self.calibration_payload})
+            self.stats.calibration_latencies.append(time.perf_counter() - t0)
+            if status != 200 or not result or result.get("status") == "error":
+                break
+            complete = result.get("status") == "calibration_complete"
+        if complete:
+            self.stats.calibrated_via = "calibration"
+            return True
+
+        # No face to calibrate on (synthetic frames): resume a plausible profile
+        status, result = self.request("POST", "/calibration/resume", {"profile": self.profile})
+        if status == 403:
+            self.stats.resume_rejected += 1
+            return False
+        if status != 200:
+            self.stats.errors += 1
+            return False
+        self.stats.calibrated_via = "resume"
+        return True
+
+    def analyze(self):
+        interval = 1.0 / self.fps
+        stats = self.stats
+        stats.started = time.perf_counter()
+        deadline = stats.started + self.duration
+        next_due = stats.started
+        index = self.offset
+        while next_due < deadline:
+            time.sleep(max(0.0, next_due - time.perf_counter()))
+            body = {
+                "image": self.payloads[index % len(self.payloads)],
+                "timestamp": int(time.time() * 1000),
+            }
+            index += 1
+            stats.sent += 1
+            t0 = time.perf_counter()
+            try:
+                status, result = self.request("POST", "/analyze", body)
+            except (OSError, http.client.HTTPException):
+                status, result = None, None
+            done = time.perf_counter()
+
+            if status == 200 and result:
+                stats.ok += 1
+                stats.latencies.append(done - t0)
+                stats.statuses[result.get("status")] = stats.statuses.get(result.get("status"), 0) + 1
+            elif status == 503:
+                stats.rejected += 1
+            else:
+                stats.errors += 1
+
+            # Frames that came due while this one was in flight are never sent
+            next_due += interval
+            while next_due < done and next_due < deadline:
+                stats.dropped += 1
+                next_due += interval
+        stats.finished = time.perf_counter()
+
+    def end(self):
+        if self.session_id:
+            try:
+                self.request("DELETE", f"/sessions/{self.session_id}")
+            except (OSError, http.client.HTTPException):
+                pass
+        if self.conn is not None:
+            self.conn.close()
+
+
+def run_level(args, concurrency, payloads, calibration_payload, profile):
+    candidates = [
+        VirtualCandidate(args.url, payloads, calibration_payload, profile, args.fps, args.duration,
+                         offset=i * len(payloads) // concurrency, annotate=args.annotate,
+                         timeout=args.timeout)
+        for i in range(concurrency)
+    ]
+    # Spread the arrivals over the ramp-up so calibrations do not all land at once
+    start = time.time()
+    threads = []
+    for i, candidate in enumerate(candidates):
+        start_at = start + args.ramp_up * i / concurrency
+        thread = threading.Thread(target=candidate.run, args=(start_at,), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    stats = [candidate.stats for candidate in candidates]
+    latencies = [t for s in stats for t in s.latencies]
+    calibration_latencies = [t for s in stats for t in s.calibration_latencies]
+    sent = sum(s.sent for s in stats)
+    ok = sum(s.ok for s in stats)
+    rejected = sum(s.rejected for s in stats)
+    errors = sum(s.errors for s in stats)
+    resume_rejected = sum(s.resume_rejected for s in stats)
+    dropped = sum(s.dropped for s in stats)
+    due = sent + dropped
+
+    statuses = {}
+    calibrated_via = {}
+    for s in stats:
+        for status, count in s.statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+        calibrated_via[s.calibrated_via or "failed"] = calibrated_via.get(s.calibrated_via or "failed", 0) + 1
+
+    # Throughput over the span in which any candidate was analyzing
+    spans = [(s.started, s.finished) for s in stats if s.started is not None and s.finished is not None]
+    elapsed = max(f for _, f in spans) - min(s for s, _ in spans) if spans else 0.0
+
+    return {
+        "concurrency": concurrency,
+        "target_fps": round(concurrency * args.fps, 2),
+        "throughput_fps": round(ok / elapsed, 2) if elapsed > 0 else 0.0,
+        "frames_due": due,
+        "sent": sent,
+        "ok": ok,
+        "rejected": rejected,
+        "errors": errors,
+        "resume_rejected": resume_rejected,
+        "dropped": dropped,
+        "error_rate": round((rejected + errors) / sent, 4) if sent else None,
+        "drop_rate": round(dropped / due, 4) if due else None,
+        "statuses": statuses,
+        "calibrated_via": calibrated_via,
+        "latency_ms": summarize_ms(latencies) if latencies else None,
+        "calibration_latency_ms": summarize_ms(calibration_latencies) if calibration_latencies else None,
+    }
+
+def within_sla(level, sla_ms, max_error_rate):
+    return (level["latency_ms"] is not None
+            and level["latency_ms"]["p99"] <= sla_ms
+            and level["error_rate"] is not None
+            and level["error_rate"] <= max_error_rate)
+
+def wait_ready(url, timeout):
+    """Poll /ready until the server has warmed up"""
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=2)
+            conn.request("GET", "/ready")
+            if conn.getresponse().status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server at {url} was not ready after {timeout:.0f}s")
+
+def spawn_server(url, signing_key):
+    """Start a local gunicorn server for the given URL with the production settings"""
+    parts = urlsplit(url)
+    env = dict(os.environ, BIND=f"{parts.hostname}:{parts.port or 80}",
+               PROFILE_SIGNING_KEY=signing_key.decode("utf-8"))
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a backend node with virtual candidates")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="base URL of the server")
+    parser.add_argument("--spawn", action="store_true",
+                        help="start a local gunicorn server on --url for the duration of the test")
+    parser.add_argument("--ready-timeout", type=float, default=120, help="seconds to wait for /ready")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32",
+                        help="comma-separated numbers of concurrent candidates")
+    parser.add_argument("--fps", type=float, default=2.0, help="frames per second sent by each candidate")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of analysis per candidate")
+    parser.add_argument("--ramp-up", type=float, default=2.0,
+                        help="seconds over which the candidates of a level arrive")
+    parser.add_argument("--cooldown", type=float, default=2.0, help="pause between levels, in seconds")
+    parser.add_argument("--face-frames", help="directory of recorded frames containing a face")
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="480p")
+    parser.add_argument("--frames", type=int, default=50, help="distinct frames in the synthetic pool")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality of the sent frames")
+    parser.add_argument("--no-annotate", dest="annotate", action="store_false",
+                        help="run the sessions in results-only mode")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout, in seconds")
+    parser.add_argument("--sla-ms", type=float, help="p99 /analyze latency budget used to find the capacity")
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="largest error rate (rejected + failed) a level may have within the SLA")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    size = RESOLUTIONS[args.resolution]
+    face_frames = load_face_frames(args.face_frames) if args.face_frames else []
+    if face_frames:
+        frames = [cv2.resize(frame, size) for frame in face_frames]
+    else:
+        print("No --face-frames given: candidates resume a synthetic calibration "
+              "and only the no-face path is measured", file=sys.stderr)
+        rng = np.random.default_rng(args.seed)
+        frames = [synthetic_frame(rng, size) for _ in range(args.frames)]
+
+    # Pre-encode the payloads so the client spends its time sending, not encoding
+    payloads = [encode_payload(frame, "dataurl", args.quality) for frame in frames]
+    calibration_payload = payloads[0]
+    signing_key = os.environ.get("PROFILE_SIGNING_KEY", "").encode("utf-8")
+    if args.spawn and not signing_key:
+        signing_key = os.urandom(16).hex().encode("utf-8")
+    elif not signing_key and not face_frames:
+        sys.exit("Candidates without --face-frames resume a signed calibration profile: set "
+                 "PROFILE_SIGNING_KEY to the server's key, or use --spawn")
+    profile = sign_profile(synthetic_profile(size), signing_key)
+
+    server = spawn_server(args.url, signing_key) if args.spawn else None
+    levels = []
+    try:
+        wait_ready(args.url, args.ready_timeout)
+        for i, concurrency in enumerate(int(c) for c in args.concurrency.split(",")):
+            if i:
+                time.sleep(args.cooldown)
+            level = run_level(args, concurrency, payloads, calibration_payload, profile)
+            levels.append(level)
+            latency = level["latency_ms"] or {"p50": float("nan"), "p99": float("nan")}
+            print(f"{concurrency:>5} candidates {level['throughput_fps']:8.1f}/{level['target_fps']:.1f} fps  "
+                  f"p50={latency['p50']:.1f}ms p99={latency['p99']:.1f}ms  "
+                  f"errors={level['error_rate']} dropped={level['drop_rate']}", file=sys.stderr)
+            if level["resume_rejected"]:
+                print(f"      {level['resume_rejected']} candidates could not resume: the server signs "
+                      f"profiles with a different PROFILE_SIGNING_KEY", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    capacity = None
+    if args.sla_ms is not None:
+        passing = [level["concurrency"] for level in levels
+                   if within_sla(level, args.sla_ms, args.max_error_rate)]
+        capacity = max(passing) if passing else 0
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "url": args.url,
+            "spawned": args.spawn,
+            "fps": args.fps,
+            "duration": args.duration,
+            "ramp_up": args.ramp_up,
+            "resolution": args.resolution,
+            "face_frames": len(face_frames),
+            "quality": args.quality,
+            "annotate": args.annotate,
+            "sla_ms": args.sla_ms,
+            "max_error_rate": args.max_error_rate,
+        },
+        "levels": levels,
+        "max_concurrency_within_sla": capacity,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,517 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from cheating import CheatingDetector
+from flask_sock import Sock, ConnectionClosed
+from cheating import CheatingDetector, decode_image, parse_calibration
+from executor import DetectionExecutor
+from inference import (InferencePool, InferenceBusy, PooledLandmarker, FaceMeshLandmarker,
+                       AdaptiveLandmarker, WarmGraphs, graphs_per_worker, SLOTS_PER_WORKER)
+from governor import MotionGate, FaceCountCheck, LandmarkSpotCheck
+from metrics import DetectorMetrics
+from profiles import create_profile_store, sign_profile, verify_profile
+from timeline import TimelineRecorder
+from evidence import EvidenceRecorder
+from sessions import SessionRegistry, SessionNotFound, SessionLimitReached
+from streaming import LatestFrameSlot, StreamLimiter
+import base64
 import json
 import logging
+import os
+import threading
+import time
+import numpy as np
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+sock = Sock(app)
 
-# Initialize the detector
-detector = CheatingDetector()
+# Reject oversized uploads before they are buffered
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_FRAME_BYTES', 8 * 1024 * 1024))
+
+# Session limits
+MAX_SESSIONS = int(os.environ.get('MAX_SESSIONS', 500))
+SESSION_IDLE_TIMEOUT = float(os.environ.get('SESSION_IDLE_TIMEOUT', 900))  # seconds
+
+# Server threads (see gunicorn.conf.py): every open /ws/analyze stream holds one,
+# so streams are capped to keep WEB_RESERVED_THREADS free for other requests
+WEB_RESERVED_THREADS = int(os.environ.get('WEB_RESERVED_THREADS', 32))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', MAX_SESSIONS + WEB_RESERVED_THREADS))
+MAX_STREAMS = int(os.environ.get('MAX_STREAMS', max(0, WEB_THREADS - WEB_RESERVED_THREADS)))
+streams = StreamLimiter(MAX_STREAMS)
+
+# 'full' runs FaceMesh on every full-resolution frame; 'adaptive' downscales and
+# crops to the previous face box, falling back to a full frame when tracking is lost
+PIPELINE_MODE = os.environ.get('PIPELINE_MODE', 'full')
+ADAPTIVE_FULL_SIZE = int(os.environ.get('ADAPTIVE_FULL_SIZE', 480))  # pixels, longest side
+ADAPTIVE_CROP_SIZE = int(os.environ.get('ADAPTIVE_CROP_SIZE', 256))  # pixels, longest side
+
+# Inference workers (0 runs FaceMesh in the request thread, one graph per session)
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', os.cpu_count() or 1))
+INFERENCE_QUEUE_SIZE = int(os.environ.get('INFERENCE_QUEUE_SIZE', 8))  # per worker
+# Each session keeps its tracking graphs (two in adaptive mode) on its worker.
+# The cap must hold all of MAX_SESSIONS, or graphs are evicted and rebuilt cold
+# on the request path; lower MAX_SESSIONS rather than this to save memory
+GRAPHS_PER_SESSION = 2 if PIPELINE_MODE == 'adaptive' else 1
+if INFERENCE_WORKERS > 0:
+    MIN_GRAPHS_PER_WORKER = graphs_per_worker(MAX_SESSIONS, INFERENCE_WORKERS, GRAPHS_PER_SESSION, spread=0)
+    INFERENCE_GRAPHS_PER_WORKER = int(os.environ.get(
+        'INFERENCE_GRAPHS_PER_WORKER', graphs_per_worker(MAX_SESSIONS, INFERENCE_WORKERS, GRAPHS_PER_SESSION)))
+    if INFERENCE_GRAPHS_PER_WORKER < MIN_GRAPHS_PER_WORKER:
+        raise ValueError(f"INFERENCE_GRAPHS_PER_WORKER ({INFERENCE_GRAPHS_PER_WORKER}) cannot hold "
+                         f"MAX_SESSIONS ({MAX_SESSIONS}) over {INFERENCE_WORKERS} workers; "
+                         f"it needs at least {MIN_GRAPHS_PER_WORKER}")
+INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 10))  # seconds
+# FaceMesh graphs built and warmed ahead of new sessions (per worker, or in-process)
+WARM_GRAPHS = int(os.environ.get('WARM_GRAPHS', 2))
+# Frames up to INFERENCE_MAX_FRAME reach the workers through shared memory slots
+# (default: two per worker; 0 pickles every frame through the queue). Each slot
+# takes width x height x 3 bytes of /dev/shm, and the pool starts with fewer
+# when they do not fit; frames finding no free slot are pickled
+INFERENCE_FRAME_SLOTS = int(os.environ.get('INFERENCE_FRAME_SLOTS',
+                                           INFERENCE_WORKERS * min(INFERENCE_QUEUE_SIZE, SLOTS_PER_WORKER)))
+INFERENCE_MAX_FRAME = tuple(int(v) for v in os.environ.get('INFERENCE_MAX_FRAME', '1920x1080').split('x'))
+
+inference_pool = None
+warm_graphs = None
+if INFERENCE_WORKERS > 0:
+    # Workers are spawned on first use (or by the server entry point)
+    inference_pool = InferencePool(INFERENCE_WORKERS, queue_size=INFERENCE_QUEUE_SIZE,
+                                   max_graphs_per_worker=INFERENCE_GRAPHS_PER_WORKER,
+                                   timeout=INFERENCE_TIMEOUT,
+                                   warm_graphs_per_worker=WARM_GRAPHS,
+                                   frame_slots=INFERENCE_FRAME_SLOTS,
+                                   max_frame_size=INFERENCE_MAX_FRAME)
+else:
+    # MediaPipe is only imported once the first graph is built
+    warm_graphs = WarmGraphs(WARM_GRAPHS)
+
+# Reuse the previous landmarks while a thumbnail of the face region differs from
+# the last inferred frame by less than MOTION_GATE_THRESHOLD gray levels on
+# average (0 disables) and MOTION_GATE_PEAK_THRESHOLD in any cell
+MOTION_GATE_THRESHOLD = float(os.environ.get('MOTION_GATE_THRESHOLD', 0))
+MOTION_GATE_PEAK_THRESHOLD = float(os.environ.get('MOTION_GATE_PEAK_THRESHOLD', 16))
+MOTION_GATE_MAX_SKIP = int(os.environ.get('MOTION_GATE_MAX_SKIP', 5))  # consecutive reused frames
+MOTION_GATE_MAX_AGE = float(os.environ.get('MOTION_GATE_MAX_AGE', 1.0))  # seconds
+
+# Count faces with the lightweight face detector every FACE_CHECK_INTERVAL
+# frames to flag a second person in view (0 disables)
+FACE_CHECK_INTERVAL = int(os.environ.get('FACE_CHECK_INTERVAL', 10))
+FACE_CHECK_SIZE = int(os.environ.get('FACE_CHECK_SIZE', 320))  # pixels, longest side
+
+# Client capture timestamps drive the alert timers, but only within
+# FRAME_TIME_TOLERANCE seconds before the server received the frame
+FRAME_TIME_TOLERANCE = float(os.environ.get('FRAME_TIME_TOLERANCE', 2.0))
+
+# Client-submitted landmarks (/analyze/landmarks) are verified against the
+# server's own on a full frame every LANDMARK_SPOT_CHECK_INTERVAL submissions
+# (0 disables); a mean deviation above the tolerance (fraction of face size) fails
+LANDMARK_SPOT_CHECK_INTERVAL = int(os.environ.get('LANDMARK_SPOT_CHECK_INTERVAL', 30))
+LANDMARK_SPOT_CHECK_TOLERANCE = float(os.environ.get('LANDMARK_SPOT_CHECK_TOLERANCE', 0.05))
+
+# FaceMesh with refined iris landmarks
+LANDMARK_COUNT = 478
+# How far outside [0, 1] normalized landmarks may lie (a face partly out of frame)
+LANDMARK_MARGIN = 0.5
+
+def create_detector(session_id):
+    """Build the detector for a new session"""
+    if inference_pool is None:
+        landmarker = FaceMeshLandmarker(warm_graphs.take())
+        warm_graphs.refill_async()
+    else:
+        landmarker = PooledLandmarker(inference_pool, session_id)
+
+    if PIPELINE_MODE == 'adaptive':
+        # Crops get their own tracking graph (see AdaptiveLandmarker)
+        if inference_pool is None:
+            crop_landmarker = FaceMeshLandmarker(warm_graphs.take())
+            warm_graphs.refill_async()
+        else:
+            crop_landmarker = PooledLandmarker(inference_pool, f"{session_id}:crop")
+        landmarker = AdaptiveLandmarker(landmarker, crop_landmarker, full_size=ADAPTIVE_FULL_SIZE,
+                                        crop_size=ADAPTIVE_CROP_SIZE)
+    detector = CheatingDetector(landmarker=landmarker)
+    if MOTION_GATE_THRESHOLD > 0:
+        detector.motion_gate = MotionGate(threshold=MOTION_GATE_THRESHOLD,
+                                          peak_threshold=MOTION_GATE_PEAK_THRESHOLD,
+                                          max_skip=MOTION_GATE_MAX_SKIP,
+                                          max_age=MOTION_GATE_MAX_AGE)
+    if FACE_CHECK_INTERVAL > 0:
+        detector.face_check = FaceCountCheck(interval=FACE_CHECK_INTERVAL, max_side=FACE_CHECK_SIZE)
+    if LANDMARK_SPOT_CHECK_INTERVAL > 0:
+        detector.landmark_check = LandmarkSpotCheck(interval=LANDMARK_SPOT_CHECK_INTERVAL,
+                                                    tolerance=LANDMARK_SPOT_CHECK_TOLERANCE)
+    if evidence is not None:
+        detector.frame_sink = lambda frame, timestamp: evidence.add_frame(session_id, timestamp, frame)
+    return detector
+
+# Per-session alert timelines, appended by a background writer (empty TIMELINE_DIR disables)
+TIMELINE_DIR = os.environ.get('TIMELINE_DIR', 'timelines')
+TIMELINE_FLUSH_INTERVAL = float(os.environ.get('TIMELINE_FLUSH_INTERVAL', 1.0))  # seconds
+
+timeline = TimelineRecorder(TIMELINE_DIR, flush_interval=TIMELINE_FLUSH_INTERVAL) if TIMELINE_DIR else None
+
+# Evidence snapshots: the last EVIDENCE_FRAMES_BEFORE frames of every session are
+# kept in memory (EVIDENCE_MAX_BYTES in total) and saved as JPEGs, with the next
+# EVIDENCE_FRAMES_AFTER frames, when an alert begins (empty EVIDENCE_DIR disables)
+EVIDENCE_DIR = os.environ.get('EVIDENCE_DIR', 'evidence')
+EVIDENCE_MAX_BYTES = int(os.environ.get('EVIDENCE_MAX_BYTES', 256 * 1024 * 1024))
+EVIDENCE_FRAMES_BEFORE = int(os.environ.get('EVIDENCE_FRAMES_BEFORE', 3))
+EVIDENCE_FRAMES_AFTER = int(os.environ.get('EVIDENCE_FRAMES_AFTER', 2))
+EVIDENCE_MAX_SIZE = int(os.environ.get('EVIDENCE_MAX_SIZE', 640))  # pixels, longest side
+
+evidence = EvidenceRecorder(EVIDENCE_DIR, max_bytes=EVIDENCE_MAX_BYTES,
+                            frames_before=EVIDENCE_FRAMES_BEFORE,
+                            frames_after=EVIDENCE_FRAMES_AFTER,
+                            max_side=EVIDENCE_MAX_SIZE) if EVIDENCE_DIR else None
+
+def on_session_closed(session):
+    """Close the open alert intervals and free the evidence buffer of an ended or evicted session"""
+    if timeline is not None:
+        # Intervals opened on frame time must close on it too
+        ended = session.detector.last_frame_time
+        timeline.end(session.session_id, ended if ended is not None else time.time())
+    if evidence is not None:
+        evidence.drop(session.session_id)
+
+# Initialize the session registry (one detector per candidate)
+sessions = SessionRegistry(create_detector, max_sessions=MAX_SESSIONS,
+                           idle_timeout=SESSION_IDLE_TIMEOUT, on_close=on_session_closed)
+sessions.start_reaper()
+
+# CPU-bound detection runs here rather than on the HTTP threads
+DETECTION_THREADS = int(os.environ.get('DETECTION_THREADS', 2 * (os.cpu_count() or 1)))
+DETECTION_QUEUE_SIZE = int(os.environ.get('DETECTION_QUEUE_SIZE', 4 * DETECTION_THREADS))
+DETECTION_TIMEOUT = float(os.environ.get('DETECTION_TIMEOUT', 30))  # seconds
+
+detection_executor = DetectionExecutor(DETECTION_THREADS, max_pending=DETECTION_QUEUE_SIZE,
+                                       timeout=DETECTION_TIMEOUT)
+
+# Calibration profile store shared by all workers ('file', 'sqlite' or 'none')
+PROFILE_STORE = os.environ.get('PROFILE_STORE', 'file')
+PROFILE_STORE_PATH = os.environ.get('PROFILE_STORE_PATH', 'profiles')
+
+profile_store = create_profile_store(PROFILE_STORE, PROFILE_STORE_PATH)
+
+# Profiles exported to clients are HMAC-signed, and only signed profiles can be
+# resumed inline, so every node and every restart must share PROFILE_SIGNING_KEY
+# (gunicorn.conf.py requires it). The development server falls back to a random
+# key, and its exported profiles only resume until it restarts
+PROFILE_SIGNING_KEY = os.environ.get('PROFILE_SIGNING_KEY', '').encode('utf-8') or os.urandom(32)
+
+# Prometheus metrics; per-stage timings are recorded for this fraction of frames
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))
+
+metrics = DetectorMetrics(sample_rate=METRICS_SAMPLE_RATE)
+metrics.active_sessions.set_function(lambda: len(sessions))
+metrics.detection_in_flight.set_function(lambda: detection_executor.in_flight)
+if inference_pool is not None:
+    metrics.inference_queue_depth.set_function(inference_pool.queue_depth)
+if evidence is not None:
+    metrics.evidence_buffered_bytes.set_function(lambda: evidence.buffered_bytes)
+
+def start_background_services():
+    """Start the inference workers and graph warm-up; called by the server entry point"""
+    if inference_pool is not None:
+        inference_pool.start()
+    else:
+        warm_graphs.refill_async()
+    if timeline is not None:
+        timeline.start()
+    if evidence is not None:
+        evidence.start()
+
+def run_calibration_step(session, img_data):
+    """Process a calibration step while holding the session lock"""
+    with session.lock:
+        start = time.perf_counter()
+        result = session.detector.process_calibration_step(img_data)
+        metrics.observe_frame('calibration', result, time.perf_counter() - start)
+
+        if result["status"] == "calibration_complete" and session.candidate_id and profile_store:
+            try:
+                profile_store.put(session.candidate_id, session.detector.export_calibration())
+                result["profile_saved"] = True
+            except Exception as e:
+                logger.error(f"Error saving calibration profile: {str(e)}")
+                result["profile_saved"] = False
+        return result
+
+def run_frame_analysis(session, img_data, annotate, timestamp=None):
+    """Analyze a frame captured at `timestamp` (seconds; now if None) while holding the session lock"""
+    if timestamp is None:
+        timestamp = time.time()
+    with session.lock:
+        detector = session.detector
+        detector.stage_observer = metrics.observe_stage if metrics.sample() else None
+        start = time.perf_counter()
+        result = detector.process_frame(img_data, annotate=annotate, timestamp=timestamp)
+        metrics.observe_frame('analyze', result, time.perf_counter() - start)
+        if detector.motion_gate is not None and result["status"] != "error" and detector.motion_gate.last_skipped:
+            metrics.inference_skipped.inc()
+        if timeline is not None:
+            timeline.record(session.session_id, timestamp, result)
+        if evidence is not None:
+            evidence.record(session.session_id, timestamp, result)
+        return result
+
+def run_landmark_analysis(session, landmarks, width, height, image, timestamp=None):
+    """Analyze client-submitted landmarks (with an optional spot-check frame) while holding the session lock"""
+    if timestamp is None:
+        timestamp = time.time()
+    with session.lock:
+        detector = session.detector
+        detector.stage_observer = metrics.observe_stage if metrics.sample() else None
+        start = time.perf_counter()
+        frame = None
+        if image is not None:
+            frame = decode_image(image)
+            if frame is None:
+                return {"status": "error", "message": "Could not decode image data"}
+        result = detector.analyze_landmarks(landmarks, width, height, timestamp=timestamp, frame=frame)
+        metrics.observe_frame('landmarks', result, time.perf_counter() - start)
+        if timeline is not None:
+            timeline.record(session.session_id, timestamp, result)
+        return result
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def get_session_id():
+    """Read the session ID from the X-Session-ID header, query string or JSON body"""
+    session_id = request.headers.get('X-Session-ID') or request.args.get('session_id')
+    if not session_id and request.is_json:
+        data = request.get_json(silent=True) or {}
+        session_id = data.get('session_id')
+    elif not session_id and request.mimetype == 'multipart/form-data':
+        session_id = request.form.get('session_id')
+    return session_id
+
+def read_frame_bytes():
+    """
+    Return the encoded frame from a raw (application/octet-stream) or multipart
+    request body. Multipart uploads held in memory are exposed as a memoryview
+    so the decoder reads straight from the request buffer.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('image')
+        if upload is None:
+            return None
+        if hasattr(upload.stream, 'getbuffer'):
+            return upload.stream.getbuffer()
+        return upload.stream.read()
+
+    data = request.get_data(cache=False)
+    return data or None
+
+def get_annotate_option():
+    """
+    Read the optional `annotate` flag from the query string or JSON body.
+    Returns None when absent so the session default applies.
+    """
+    value = request.args.get('annotate')
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('annotate')
+    if value is None or isinstance(value, bool):
+        return value
+    return str(value).lower() not in ('0', 'false', 'no', 'off')
+
+def parse_timestamp(value):
+    """Convert a client capture timestamp in milliseconds since the epoch to seconds"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value) / 1000.0
+    except (TypeError, ValueError):
+        return None
+
+def frame_time(timestamp, received):
+    """
+    Time a frame is analyzed at: its capture time (seconds) clamped to at most
+    FRAME_TIME_TOLERANCE before the server received it and never after, or
+    the receive time if the client sent none. A client can therefore neither
+    freeze the alert timers by repeating a timestamp nor advance them faster
+    than real time.
+    """
+    if timestamp is None:
+        return received
+    return min(received, max(timestamp, received - FRAME_TIME_TOLERANCE))
+
+def get_frame_timestamp():
+    """
+    Read the frame's capture timestamp (milliseconds since the epoch, e.g.
+    Date.now() at capture) from the X-Frame-Timestamp header, query string,
+    JSON body or multipart form. Returns seconds, bounded by frame_time
+    against the time of this request.
+    """
+    value = request.headers.get('X-Frame-Timestamp') or request.args.get('timestamp')
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('timestamp')
+    elif value is None and request.mimetype == 'multipart/form-data':
+        value = request.form.get('timestamp')
+    return frame_time(parse_timestamp(value), time.time())
+
+def parse_landmarks(value):
+    """
+    Parse submitted landmarks: a list of [x, y, z] rows, or a base64 string of
+    little-endian float32 x, y, z triples. None (no face) is passed through.
+    Raises ValueError for anything that is not a full set of finite landmarks.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        raw = np.frombuffer(base64.b64decode(value), dtype='<f4')
+        if raw.size % 3:
+            raise ValueError("Landmark buffer is not a whole number of x, y, z triples")
+        landmarks = raw.reshape(-1, 3).astype(np.float64)
+    else:
+        landmarks = np.asarray(value, dtype=np.float64)
+    if landmarks.ndim != 2 or landmarks.shape[1] not in (2, 3) or landmarks.shape[0] < LANDMARK_COUNT:
+        raise ValueError(f"Expected {LANDMARK_COUNT}x3 landmarks, got shape {landmarks.shape}")
+    if not np.isfinite(landmarks).all():
+        raise ValueError("Landmarks must be finite numbers")
+    xy = landmarks[:, :2]
+    if xy.min() < -LANDMARK_MARGIN or xy.max() > 1 + LANDMARK_MARGIN:
+        raise ValueError("Landmark x, y must be normalized to the frame size")
+    return landmarks
+
+def session_not_found():
+    return jsonify({
+        "status": "error",
+        "message": "Unknown or expired session. Please start calibration again."
+    }), 404
+
+def inference_busy(error):
+    logger.warning(str(error))
+    metrics.rejected.labels('busy').inc()
+    response = jsonify({"status": "error", "message": str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint to check if the server is running"""
     return jsonify({"status": "ok", "message": "Server is running"})
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness endpoint: 503 until the inference workers (or the in-process
+    graph pool) have loaded MediaPipe and warmed their FaceMesh graphs.
+    /health only reports that the process is up.
+    """
+    if inference_pool is not None:
+        ready = inference_pool.ready()
+    else:
+        ready = warm_graphs.ready()
+    if not ready:
+        return jsonify({"status": "starting", "message": "Warming up inference"}), 503
+    return jsonify({"status": "ready", "active_sessions": len(sessions)})
+
 @app.route('/calibration/start', methods=['POST'])
 def start_calibration():
-    """Endpoint to start the calibration process"""
+    """
+    Endpoint to start the calibration process, issuing a session ID if needed.
+    Pass `annotate: false` to make the session return structured results only,
+    and `candidate_id` to persist the finished calibration for later resume.
+    """
     try:
-        result = detector.start_calibration()
+        session_id = get_session_id()
+        try:
+            session = sessions.get(session_id)
+        except SessionNotFound:
+            session = sessions.create()
+
+        annotate = get_annotate_option()
+        data = request.get_json(silent=True) or {}
+        with session.lock:
+            if annotate is not None:
+                session.detector.annotate = annotate
+            if data.get('candidate_id'):
+                session.candidate_id = str(data['candidate_id'])
+            result = session.detector.start_calibration()
+        result["session_id"] = session.session_id
         return jsonify(result)
+    except SessionLimitReached as e:
+        logger.warning(str(e))
+        metrics.rejected.labels('session_limit').inc()
+        return jsonify({"status": "error", "message": str(e)}), 503
     except Exception as e:
         logger.error(f"Error starting calibration: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/calibration/resume', methods=['POST'])
+def resume_calibration():
+    """
+    Endpoint to skip calibration by loading a stored profile, either by
+    `candidate_id` from the profile store or passed inline as a `profile`
+    signed by /calibration/profile. Reuses the given session if it is still
+    live, otherwise creates one.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        profile = data.get('profile')
+        candidate_id = data.get('candidate_id')
+
+        if profile is None:
+            if not candidate_id:
+                return jsonify({"status": "error", "message": "Provide candidate_id or profile"}), 400
+            if profile_store is None:
+                return jsonify({"status": "error", "message": "Profile store is disabled"}), 400
+            profile = profile_store.get(str(candidate_id))
+            if profile is None:
+                return jsonify({"status": "error", "message": "No stored calibration for this candidate"}), 404
+        else:
+            # Client-held profiles are only trusted if this server issued them
+            profile = verify_profile(profile, PROFILE_SIGNING_KEY)
+            if profile is None:
+                return jsonify({"status": "error", "message": "Calibration profile is not signed by this server"}), 403
+
+        # Validate before touching any session, so a bad profile leaves nothing behind
+        try:
+            parse_calibration(profile)
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"status": "error", "message": f"Invalid calibration profile: {str(e)}"}), 400
+
+        try:
+            session = sessions.get(get_session_id())
+        except SessionNotFound:
+            session = sessions.create()
+
+        annotate = get_annotate_option()
+        with session.lock:
+            session.detector.load_calibration(profile)
+            if annotate is not None:
+                session.detector.annotate = annotate
+            if candidate_id:
+                session.candidate_id = str(candidate_id)
+
+        return jsonify({
+            "status": "calibration_resumed",
+            "session_id": session.session_id,
+            "message": "Calibration restored from profile"
+        })
+    except SessionLimitReached as e:
+        logger.warning(str(e))
+        metrics.rejected.labels('session_limit').inc()
+        return jsonify({"status": "error", "message": str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error resuming calibration: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/calibration/profile', methods=['GET'])
+def export_calibration_profile():
+    """Endpoint to export a calibrated session's compact calibration profile, signed for inline resume"""
+    try:
+        session = sessions.get(get_session_id())
+        with session.lock:
+            if not session.detector.calibrated:
+                return jsonify({"status": "error", "message": "Detector not calibrated"}), 400
+            profile = session.detector.export_calibration()
+        return jsonify({"status": "ok", "profile": sign_profile(profile, PROFILE_SIGNING_KEY)})
+    except SessionNotFound:
+        return session_not_found()
+
 @app.route('/calibration/step', methods=['POST'])
 def calibration_step():
     """Endpoint to process a single calibration step"""
@@ -36,9 +519,14 @@ def calibration_step():
         data = request.json
         if not data or 'image' not in data:
             return jsonify({"status": "error", "message": "No image data provided"}), 400
-            
-        result = detector.process_calibration_step(data['image'])
+
+        session = sessions.get(get_session_id())
+        result = detection_executor.run(run_calibration_step, session, data['image'])
         return jsonify(result)
+    except SessionNotFound:
+        return session_not_found()
+    except InferenceBusy as e:
+        return inference_busy(e)
     except Exception as e:
         logger.error(f"Error processing calibration step: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -50,27 +538,268 @@ def analyze_frame():
         data = request.json
         if not data or 'image' not in data:
             return jsonify({"status": "error", "message": "No image data provided"}), 400
-            
-        if not detector.calibrated:
+
+        session = sessions.get(get_session_id())
+        if not session.detector.calibrated:
+            return jsonify({
+                "status": "error",
+                "message": "Detector not calibrated. Please complete calibration first."
+            }), 400
+
+        result = detection_executor.run(run_frame_analysis, session, data['image'], get_annotate_option(),
+                                        get_frame_timestamp())
+        return jsonify(result)
+    except SessionNotFound:
+        return session_not_found()
+    except InferenceBusy as e:
+        return inference_busy(e)
+    except Exception as e:
+        logger.error(f"Error analyzing frame: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/calibration/step/raw', methods=['POST'])
+def calibration_step_raw():
+    """Endpoint to process a calibration step from raw JPEG/WebP bytes"""
+    try:
+        frame_bytes = read_frame_bytes()
+        if frame_bytes is None:
+            return jsonify({"status": "error", "message": "No image data provided"}), 400
+
+        session = sessions.get(get_session_id())
+        result = detection_executor.run(run_calibration_step, session, frame_bytes)
+        return jsonify(result)
+    except SessionNotFound:
+        return session_not_found()
+    except InferenceBusy as e:
+        return inference_busy(e)
+    except Exception as e:
+        logger.error(f"Error processing calibration step: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/analyze/raw', methods=['POST'])
+def analyze_frame_raw():
+    """Endpoint to analyze a frame sent as raw JPEG/WebP bytes instead of a data URL"""
+    try:
+        frame_bytes = read_frame_bytes()
+        if frame_bytes is None:
+            return jsonify({"status": "error", "message": "No image data provided"}), 400
+
+        session = sessions.get(get_session_id())
+        if not session.detector.calibrated:
             return jsonify({
-                "status": "error", 
+                "status": "error",
                 "message": "Detector not calibrated. Please complete calibration first."
             }), 400
-            
-        result = detector.process_frame(data['image'])
+
+        result = detection_executor.run(run_frame_analysis, session, frame_bytes, get_annotate_option(),
+                                        get_frame_timestamp())
         return jsonify(result)
+    except SessionNotFound:
+        return session_not_found()
+    except InferenceBusy as e:
+        return inference_busy(e)
     except Exception as e:
         logger.error(f"Error analyzing frame: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/analyze/landmarks', methods=['POST'])
+def analyze_landmarks():
+    """
+    Endpoint to analyze landmarks computed in the browser instead of a frame.
+    JSON body: `landmarks` (478x3 normalized floats, or base64 float32; null
+    if no face), `width` and `height` of the source frame, optional
+    `timestamp`, and `image` (data URL) when the previous result asked for a
+    spot check with `spot_check: true`.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not data or 'landmarks' not in data:
+            return jsonify({"status": "error", "message": "No landmarks provided"}), 400
+        try:
+            landmarks = parse_landmarks(data['landmarks'])
+            width = int(data.get('width', 0))
+            height = int(data.get('height', 0))
+        except (TypeError, ValueError) as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        image = data.get('image')
+        if image is None and (width <= 0 or height <= 0):
+            return jsonify({"status": "error", "message": "Frame width and height are required"}), 400
+
+        session = sessions.get(get_session_id())
+        if not session.detector.calibrated:
+            return jsonify({
+                "status": "error",
+                "message": "Detector not calibrated. Please complete calibration first."
+            }), 400
+
+        result = detection_executor.run(run_landmark_analysis, session, landmarks, width, height, image,
+                                        get_frame_timestamp())
+        return jsonify(result)
+    except SessionNotFound:
+        return session_not_found()
+    except InferenceBusy as e:
+        return inference_busy(e)
+    except Exception as e:
+        logger.error(f"Error analyzing landmarks: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@sock.route('/ws/analyze')
+def analyze_stream(ws):
+    """
+    Streaming analysis channel. The client sends binary JPEG/WebP frames and
+    receives one compact JSON result per processed frame. Only the newest
+    pending frame is processed; frames superseded while the detector is busy
+    are dropped and counted. A text message {"timestamp": <ms>} sets the
+    capture time of the next binary frame; results echo it back.
+    """
+    try:
+        session = sessions.get(get_session_id())
+    except SessionNotFound:
+        ws.send(json.dumps({"status": "error", "message": "Unknown or expired session"}))
+        return
+
+    if not streams.acquire():
+        logger.warning(f"Stream limit of {MAX_STREAMS} reached")
+        metrics.rejected.labels('stream_limit').inc()
+        ws.send(json.dumps({"status": "busy", "message": "Too many open streams, please retry"}))
+        return
+    try:
+        stream_frames(ws, session)
+    finally:
+        streams.release()
+
+def stream_frames(ws, session):
+    """Receive and analyze one stream's frames until the client disconnects"""
+    slot = LatestFrameSlot()
+
+    def receive_frames():
+        timestamp = None
+        try:
+            while True:
+                message = ws.receive()
+                if isinstance(message, (bytes, bytearray)):
+                    slot.put((message, timestamp, frame_time(timestamp, time.time())))
+                    timestamp = None
+                elif isinstance(message, str):
+                    try:
+                        timestamp = parse_timestamp(json.loads(message).get('timestamp'))
+                    except (ValueError, AttributeError):
+                        timestamp = None
+        except ConnectionClosed:
+            pass
+        finally:
+            slot.close()
+
+    threading.Thread(target=receive_frames, name="ws-receiver", daemon=True).start()
+
+    processed = 0
+    reported_dropped = 0
+    try:
+        while True:
+            message = slot.take(timeout=1.0)
+            if message is None:
+                if slot.closed:
+                    break
+                continue
+            frame_bytes, timestamp, analyzed_at = message
+
+            try:
+                session = sessions.get(session.session_id)
+                if not session.detector.calibrated:
+                    result = {
+                        "status": "error",
+                        "message": "Detector not calibrated. Please complete calibration first."
+                    }
+                else:
+                    result = detection_executor.run(run_frame_analysis, session, frame_bytes, False, analyzed_at)
+            except InferenceBusy as e:
+                metrics.rejected.labels('busy').inc()
+                result = {"status": "busy", "message": str(e)}
+            except SessionNotFound:
+                ws.send(json.dumps({"status": "error", "message": "Unknown or expired session"}))
+                break
+
+            if slot.dropped > reported_dropped:
+                metrics.stream_dropped.inc(slot.dropped - reported_dropped)
+                reported_dropped = slot.dropped
+
+            processed += 1
+            if timestamp is not None:
+                result["timestamp"] = round(timestamp * 1000)
+            result["processed"] = processed
+            result["dropped"] = slot.dropped
+            ws.send(json.dumps(result))
+    except ConnectionClosed:
+        pass
+    except Exception as e:
+        logger.error(f"Error in analysis stream: {str(e)}")
+    finally:
+        slot.close()
+
 @app.route('/status', methods=['GET'])
 def detector_status():
-    """Endpoint to check the status of the detector"""
+    """Endpoint to check the status of a session's detector"""
+    try:
+        session = sessions.get(get_session_id())
+    except SessionNotFound:
+        return jsonify({
+            "calibrated": False,
+            "calibration_step": 0,
+            "tracking_started": False,
+            "active_sessions": len(sessions)
+        })
+
+    detector = session.detector
     return jsonify({
+        "session_id": session.session_id,
         "calibrated": detector.calibrated,
         "calibration_step": detector.current_step if not detector.calibrated else "complete",
-        "tracking_started": detector.tracking_started
+        "tracking_started": detector.tracking_started,
+        "active_sessions": len(sessions)
     })
 
+@app.route('/timeline', methods=['GET'])
+def session_timeline():
+    """
+    Endpoint returning a session's alert intervals and per-signal totals.
+    Optional `start` and `end` (Unix seconds) clip the timeline to a window.
+    Works for ended sessions as long as their timeline file is kept.
+    """
+    if timeline is None:
+        return jsonify({"status": "error", "message": "Timelines are disabled"}), 404
+
+    session_id = get_session_id()
+    if not session_id:
+        return jsonify({"status": "error", "message": "No session_id provided"}), 400
+    try:
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+        result = timeline.summarize(session_id, start=start, end=end)
+        return jsonify({"status": "ok", "session_id": session_id, **result})
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error reading timeline: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Endpoint exposing latency histograms, frame counters and load gauges for Prometheus"""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def end_session(session_id):
+    """Endpoint to end a session and free its detector"""
+    try:
+        sessions.remove(session_id)
+        return jsonify({"status": "ok", "message": "Session ended"})
+    except SessionNotFound:
+        return session_not_found()
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Development server only; production runs `gunicorn -c gunicorn.conf.py main:app`
+    start_background_services()
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)),
+            debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
+
@@ -0,0 +1,80 @@
+import random
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# Per-stage work ranges from tens of microseconds (EAR) to tens of milliseconds (FaceMesh)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+FRAME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class DetectorMetrics:
+    """
+    Prometheus metrics for the detection service.
+
+    Frame counters are updated for every frame. Per-stage histograms are only
+    fed for a `sample_rate` fraction of frames, so the per-stage timing
+    overhead can be turned down on busy nodes.
+    """
+
+    def __init__(self, sample_rate=1.0, registry=None):
+        self.sample_rate = sample_rate
+        self.registry = registry if registry is not None else CollectorRegistry()
+
+        self.stage_seconds = Histogram(
+            "proctor_stage_seconds", "Time spent in each detection stage (sampled)",
+            ["stage"], buckets=STAGE_BUCKETS, registry=self.registry)
+        self.frame_seconds = Histogram(
+            "proctor_frame_seconds", "End-to-end frame processing time",
+            ["kind"], buckets=FRAME_BUCKETS, registry=self.registry)
+        self.frames = Counter(
+            "proctor_frames_total", "Frames processed, by kind and result status",
+            ["kind", "status"], registry=self.registry)
+        self.alert_frames = Counter(
+            "proctor_alert_frames_total", "Analyzed frames with each alert active",
+            ["alert"], registry=self.registry)
+        self.rejected = Counter(
+            "proctor_rejected_total", "Requests rejected because the backend was busy",
+            ["reason"], registry=self.registry)
+        self.stream_dropped = Counter(
+            "proctor_stream_dropped_frames_total", "Streamed frames superseded before processing",
+            registry=self.registry)
+        self.inference_skipped = Counter(
+            "proctor_inference_skipped_total", "Analyzed frames that reused the previous landmarks",
+            registry=self.registry)
+
+        self.active_sessions = Gauge(
+            "proctor_active_sessions", "Live detector sessions", registry=self.registry)
+        self.inference_queue_depth = Gauge(
+            "proctor_inference_queue_depth", "Requests waiting for an inference worker",
+            registry=self.registry)
+        self.detection_in_flight = Gauge(
+            "proctor_detection_in_flight", "Detection tasks running or waiting on the executor",
+            registry=self.registry)
+        self.evidence_buffered_bytes = Gauge(
+            "proctor_evidence_buffered_bytes", "Memory held by the evidence frame buffers",
+            registry=self.registry)
+
+        # Resolve label children once; observe_stage runs several times per frame
+        self._stage_children = {}
+
+    def sample(self):
+        """Whether stage timings should be recorded for the next frame"""
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def observe_stage(self, stage, seconds):
+        """Stage observer for CheatingDetector.stage_observer"""
+        child = self._stage_children.get(stage)
+        if child is None:
+            child = self._stage_children[stage] = self.stage_seconds.labels(stage)
+        child.observe(seconds)
+
+    def observe_frame(self, kind, result, seconds):
+        """Count one processed frame and its alerts"""
+        self.frame_seconds.labels(kind).observe(seconds)
+        self.frames.labels(kind, result.get("status", "unknown")).inc()
+        for alert, active in result.get("alerts", {}).items():
+            if active:
+                self.alert_frames.labels(alert).inc()
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format"""
+        return generate_latest(self.registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,147 @@
+import abc
+import hashlib
+import hmac
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+SIGNATURE_KEY = "signature"
+
+
+def _canonical(profile):
+    """
+    Serialization that signing and verification agree on after a trip through
+    a browser: numbers are compared as floats, since JSON.stringify writes
+    480.0 as 480
+    """
+    def normalize(value):
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items() if k != SIGNATURE_KEY}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        return value
+    return json.dumps(normalize(profile), sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def sign_profile(profile, key):
+    """Return a copy of profile carrying an HMAC-SHA256 signature of its contents"""
+    signed = dict(profile)
+    signed[SIGNATURE_KEY] = hmac.new(key, _canonical(profile), hashlib.sha256).hexdigest()
+    return signed
+
+
+def verify_profile(profile, key):
+    """Return profile without its signature if it was signed with key, otherwise None"""
+    if not isinstance(profile, dict) or not isinstance(profile.get(SIGNATURE_KEY), str):
+        return None
+    expected = hmac.new(key, _canonical(profile), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, profile[SIGNATURE_KEY]):
+        return None
+    return {k: v for k, v in profile.items() if k != SIGNATURE_KEY}
+
+
+class ProfileStore(abc.ABC):
+    """Key-value store for calibration profiles produced by CheatingDetector.export_calibration"""
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Return the stored profile for key, or None"""
+
+    @abc.abstractmethod
+    def put(self, key, profile):
+        """Store (or replace) the profile for key"""
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """Remove the profile for key if it exists"""
+
+
+class FileProfileStore(ProfileStore):
+    """One compact JSON file per profile in a directory (which may be a shared volume)"""
+
+    _SAFE_KEY = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        if not self._SAFE_KEY.match(key) or key.startswith("."):
+            key = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, profile):
+        # Write to a temporary file and rename so readers never see a partial profile
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(profile, f, separators=(",", ":"))
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteProfileStore(ProfileStore):
+    """Profiles in a single SQLite table"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            " key TEXT PRIMARY KEY,"
+            " profile TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT profile FROM profiles WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, profile):
+        data = json.dumps(profile, separators=(",", ":"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO profiles (key, profile, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET profile = excluded.profile, updated_at = excluded.updated_at",
+                (key, data, time.time())
+            )
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM profiles WHERE key = ?", (key,))
+
+
+def create_profile_store(kind, path):
+    """Build the store selected by configuration; kind is 'file', 'sqlite' or 'none'"""
+    if kind == "file":
+        return FileProfileStore(path)
+    if kind == "sqlite":
+        return SQLiteProfileStore(path)
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown profile store type: {kind}")
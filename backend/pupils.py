@@ -0,0 +1,52 @@
+import cv2
+
+
+class PupilAnalyzer:
+    """
+    Locates the pupils of both eyes in their padded eye boxes.
+
+    Each box is converted to grayscale and thresholded in place, and the
+    pupil is the largest external contour of the mask by enclosed area, so
+    holes such as specular highlights do not shrink it and blobs one pixel
+    thin (no area) are never taken for it. Its center comes from the contour
+    moments, kept sub-pixel. `python bench.py` times this against the
+    per-eye search it replaced on clean and speckled eye regions.
+    """
+
+    def __init__(self, threshold=50, padding=5):
+        self.threshold = threshold  # gray level below which a pixel counts as pupil
+        self.padding = padding  # pixels added around the eye landmarks
+
+    def eye_box(self, eye, w, h):
+        """Padded (left, top, right, bottom) box around an eye's pixel landmarks, clipped to the frame"""
+        min_x, min_y = eye.min(axis=0).tolist()
+        max_x, max_y = eye.max(axis=0).tolist()
+        return (max(0, min_x - self.padding), max(0, min_y - self.padding),
+                min(w, max_x + self.padding), min(h, max_y + self.padding))
+
+    def analyze(self, frame, left_eye, right_eye):
+        """Sub-pixel (x, y) pupil centers in frame pixels for both eyes, None where no pupil was found"""
+        h, w = frame.shape[:2]
+        centers = []
+        for eye in (left_eye, right_eye):
+            left, top, right, bottom = self.eye_box(eye, w, h)
+            if right <= left or bottom <= top:
+                centers.append(None)
+                continue
+            gray = cv2.cvtColor(frame[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+            center = self._centroid(gray)
+            centers.append(None if center is None else (left + center[0], top + center[1]))
+        return centers[0], centers[1]
+
+    def _centroid(self, gray_eye):
+        mask = cv2.threshold(gray_eye, self.threshold, 255, cv2.THRESH_BINARY_INV, dst=gray_eye)[1]
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # Specks traced as one or two points enclose no area; skipping them
+        # before measuring the rest matters in regions full of them
+        contours = [contour for contour in contours if len(contour) > 2]
+        if not contours:
+            return None
+        moments = cv2.moments(max(contours, key=cv2.contourArea))
+        if moments["m00"] == 0:
+            return None
+        return moments["m10"] / moments["m00"], moments["m01"] / moments["m00"]
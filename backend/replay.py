@@ -0,0 +1,207 @@
+"""
+Offline batch analysis of recorded exam sessions.
+
+    # Build a calibration profile from the five calibration images
+    # (center, left, right, top, bottom)
+    python replay.py calibrate center.jpg left.jpg right.jpg top.jpg bottom.jpg -o profile.json
+
+    # Analyze recordings (video files or directories of images) in parallel,
+    # writing one JSONL timeline per input
+    python replay.py analyze --calibration profile.json --out-dir timelines/ exam1.webm exam2/
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from cheating import CheatingDetector
+from inference import FaceMeshLandmarker, AdaptiveLandmarker
+from governor import FaceCountCheck
+
+logger = logging.getLogger("replay")
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+def iter_frames(path, fps=2.0):
+    """
+    Yield (index, timestamp_seconds, frame) from a video file or a directory of
+    images. Image directories are read in name order at the given frame rate.
+    """
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path)
+                       if os.path.splitext(n)[1].lower() in IMAGE_EXTENSIONS)
+        for index, name in enumerate(names):
+            frame = cv2.imread(os.path.join(path, name), cv2.IMREAD_COLOR)
+            if frame is not None:
+                yield index, index / fps, frame
+        return
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video: {path}")
+    try:
+        index = 0
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield index, capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, frame
+            index += 1
+    finally:
+        capture.release()
+
+def build_detector(profile=None, adaptive=False, face_check_interval=0):
+    """Build a results-only detector with its own in-process FaceMesh graph"""
+    landmarker = FaceMeshLandmarker()
+    if adaptive:
+        landmarker = AdaptiveLandmarker(landmarker, FaceMeshLandmarker())
+    detector = CheatingDetector(annotate=False, landmarker=landmarker)
+    if face_check_interval > 0:
+        detector.face_check = FaceCountCheck(interval=face_check_interval)
+    if profile is not None:
+        detector.load_calibration(profile)
+    return detector
+
+def analyze_recording(path, profile, out_path, fps=2.0, stride=1, adaptive=False, face_check_interval=10):
+    """Analyze one recording and write its per-frame JSONL timeline; returns a summary"""
+    detector = build_detector(profile, adaptive=adaptive, face_check_interval=face_check_interval)
+    frames = alert_frames = no_face_frames = 0
+
+    try:
+        with open(out_path, "w") as out:
+            for index, timestamp, frame in iter_frames(path, fps=fps):
+                if index % stride:
+                    continue
+
+                # Video time drives the detector's timers, so replay speed does not matter
+                result = detector.analyze_frame(frame, timestamp=timestamp)
+                frames += 1
+                if result["status"] == "no_face":
+                    no_face_frames += 1
+                if result.get("cheating_detected"):
+                    alert_frames += 1
+
+                record = {
+                    "frame": index,
+                    "timestamp": round(timestamp, 3),
+                    "status": result["status"],
+                    "cheating_detected": result.get("cheating_detected", False),
+                    "alerts": result.get("alerts", {}),
+                    "signals": result.get("signals")
+                }
+                out.write(json.dumps(record) + "\n")
+    finally:
+        detector.close()
+
+    return {
+        "input": path,
+        "output": out_path,
+        "frames": frames,
+        "alert_frames": alert_frames,
+        "no_face_frames": no_face_frames
+    }
+
+def calibrate(args):
+    if len(args.images) != 5:
+        sys.exit("calibrate needs exactly 5 images: center, left, right, top, bottom")
+
+    detector = build_detector()
+    try:
+        detector.start_calibration()
+        for image_path in args.images:
+            frame = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            if frame is None:
+                sys.exit(f"Could not read image: {image_path}")
+            result = detector.calibrate_frame(frame)
+            if result["status"] == "error":
+                sys.exit(f"{image_path}: {result['message']}")
+        profile = detector.export_calibration()
+    finally:
+        detector.close()
+
+    with open(args.output, "w") as f:
+        json.dump(profile, f)
+    logger.info(f"Wrote calibration profile to {args.output}")
+
+def output_names(paths):
+    """
+    The timeline file name (without extension) for each input: its base name,
+    with the input's 1-based position appended when several inputs share it
+    (e.g. a/exam.mp4 and b/exam.mp4). Raises ValueError if names still clash.
+    """
+    stems = [os.path.splitext(os.path.basename(os.path.normpath(path)))[0] for path in paths]
+    # Case-insensitive, as on the file systems of macOS and Windows
+    counts = Counter(stem.lower() for stem in stems)
+    names = [stem if counts[stem.lower()] == 1 else f"{stem}-{index}" for index, stem in enumerate(stems, 1)]
+    clashes = [name for name, count in Counter(name.lower() for name in names).items() if count > 1]
+    if clashes:
+        raise ValueError(f"Inputs would share the timeline file(s) {', '.join(sorted(clashes))}; "
+                         f"rename them or analyze them into separate directories")
+    return names
+
+def analyze(args):
+    with open(args.calibration) as f:
+        profile = json.load(f)
+
+    try:
+        names = output_names(args.inputs)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    jobs = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for path, name in zip(args.inputs, names):
+            out_path = os.path.join(args.out_dir, f"{name}.jsonl")
+            future = pool.submit(analyze_recording, path, profile, out_path,
+                                 fps=args.fps, stride=args.stride, adaptive=args.adaptive,
+                                 face_check_interval=args.face_check_interval)
+            jobs[future] = path
+
+        failed = 0
+        for future in as_completed(jobs):
+            try:
+                summary = future.result()
+                print(json.dumps(summary), flush=True)
+            except Exception as e:
+                failed += 1
+                logger.error(f"Error analyzing {jobs[future]}: {str(e)}")
+
+    if failed:
+        sys.exit(1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline analysis of recorded exam sessions")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = subparsers.add_parser("calibrate", help="build a calibration profile from 5 images")
+    calibrate_parser.add_argument("images", nargs="+", help="center, left, right, top and bottom images")
+    calibrate_parser.add_argument("-o", "--output", default="profile.json", help="profile file to write")
+    calibrate_parser.set_defaults(func=calibrate)
+
+    analyze_parser = subparsers.add_parser("analyze", help="analyze recordings into JSONL timelines")
+    analyze_parser.add_argument("inputs", nargs="+", help="video files or directories of images")
+    analyze_parser.add_argument("-c", "--calibration", required=True, help="calibration profile (JSON)")
+    analyze_parser.add_argument("-o", "--out-dir", default="timelines", help="directory for JSONL timelines")
+    analyze_parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(),
+                                help="number of recordings analyzed in parallel")
+    analyze_parser.add_argument("--fps", type=float, default=2.0,
+                                help="frame rate assumed for image directories")
+    analyze_parser.add_argument("--stride", type=int, default=1, help="analyze every Nth frame")
+    analyze_parser.add_argument("--adaptive", action="store_true",
+                                help="use the adaptive crop-and-downscale landmark pipeline")
+    analyze_parser.add_argument("--face-check-interval", type=int, default=10,
+                                help="count faces every Nth analyzed frame to flag a second person (0 disables)")
+    analyze_parser.set_defaults(func=analyze)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
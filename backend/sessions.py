@@ -0,0 +1,148 @@
+import threading
+import time
+import uuid
+
+
+class SessionNotFound(KeyError):
+    """Raised when a session ID is unknown or has been evicted"""
+
+
+class SessionLimitReached(RuntimeError):
+    """Raised when the registry is full and no idle session can be evicted"""
+
+
+class Session:
+    """One candidate's detector together with the lock that serializes access to it"""
+
+    def __init__(self, session_id, detector):
+        self.session_id = session_id
+        self.detector = detector
+        self.lock = threading.Lock()
+        # Key under which the session's calibration profile is persisted
+        self.candidate_id = None
+        self.created_at = time.monotonic()
+        self.last_seen = self.created_at
+
+    def touch(self):
+        """Mark the session as active now"""
+        self.last_seen = time.monotonic()
+
+    def idle_for(self, now=None):
+        """Seconds since the session was last used"""
+        if now is None:
+            now = time.monotonic()
+        return now - self.last_seen
+
+
+class SessionRegistry:
+    """
+    Maps session IDs to per-candidate detector state.
+
+    Sessions idle for longer than `idle_timeout` seconds are evicted lazily on
+    lookup/creation and periodically by the reaper thread. At most
+    `max_sessions` sessions are live at any time.
+    """
+
+    def __init__(self, detector_factory, max_sessions=500, idle_timeout=900, on_close=None):
+        # detector_factory(session_id) builds the detector for a new session
+        self.detector_factory = detector_factory
+        # Optional on_close(session), called after a session's detector is released
+        self.on_close = on_close
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def create(self):
+        """Create a new session with a fresh detector"""
+        self.evict_idle()
+
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitReached(
+                    f"Session limit reached ({self.max_sessions} active sessions)"
+                )
+
+        # Building a detector is slow, so do it outside the registry lock
+        session_id = uuid.uuid4().hex
+        session = Session(session_id, self.detector_factory(session_id))
+
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                rejected = session
+            else:
+                self._sessions[session.session_id] = session
+                rejected = None
+
+        if rejected is not None:
+            self._close(rejected)
+            raise SessionLimitReached(
+                f"Session limit reached ({self.max_sessions} active sessions)"
+            )
+        return session
+
+    def get(self, session_id):
+        """Look up a live session and mark it as active"""
+        if not session_id:
+            raise SessionNotFound(session_id)
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise SessionNotFound(session_id)
+            if session.idle_for() > self.idle_timeout:
+                del self._sessions[session_id]
+                expired = session
+            else:
+                session.touch()
+                return session
+
+        self._close(expired)
+        raise SessionNotFound(session_id)
+
+    def remove(self, session_id):
+        """End a session and release its detector"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            raise SessionNotFound(session_id)
+        self._close(session)
+
+    def evict_idle(self):
+        """Drop every session idle for longer than the timeout; returns the count"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [s for s in self._sessions.values()
+                       if s.idle_for(now) > self.idle_timeout]
+            for session in expired:
+                del self._sessions[session.session_id]
+
+        for session in expired:
+            self._close(session)
+        return len(expired)
+
+    def start_reaper(self, interval=60):
+        """Start a daemon thread that evicts idle sessions every `interval` seconds"""
+        if self._reaper is not None:
+            return
+
+        def reap():
+            while True:
+                time.sleep(interval)
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name="session-reaper", daemon=True)
+        self._reaper.start()
+
+    def _close(self, session):
+        # Wait for any in-flight request on this session before tearing it down
+        with session.lock:
+            session.detector.close()
+        if self.on_close is not None:
+            self.on_close(session)
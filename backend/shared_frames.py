@@ -0,0 +1,117 @@
+import os
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Where POSIX shared memory blocks live on Linux
+SHM_DIR = "/dev/shm"
+
+
+def shm_free_bytes(path=SHM_DIR):
+    """Bytes free for shared memory blocks, or None where there is no such filesystem to inspect"""
+    try:
+        stats = os.statvfs(path)
+    except (AttributeError, OSError):
+        return None
+    return stats.f_bavail * stats.f_frsize
+
+
+def _reserve(shm):
+    """Allocate a new block's pages now; tmpfs otherwise allocates them on first write"""
+    path = os.path.join(SHM_DIR, shm.name.lstrip("/"))
+    if not hasattr(os, "posix_fallocate") or not os.path.exists(path):
+        return
+    fd = os.open(path, os.O_RDWR)
+    try:
+        os.posix_fallocate(fd, 0, shm.size)
+    finally:
+        os.close(fd)
+
+
+def _attach(name):
+    """Attach to a block created by the pool owner, which is responsible for unlinking it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers the block again, but spawned workers share
+        # the owner's resource tracker, so the owner's unlink clears it
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameSlots:
+    """
+    Fixed set of frame-sized slots in one shared memory block, used to hand
+    frames from the web process to the inference workers without pickling
+    them through a queue.
+
+    The owner (create=True) keeps the free list: acquire() hands out a slot
+    index or None when all are in use (the pool then pickles the frame),
+    and release() recycles it once the worker has answered. Workers attach
+    by name and read frames in place with view().
+
+    The owner reserves the whole block up front, so a shared memory
+    filesystem too small for it raises OSError here instead of killing the
+    process with SIGBUS on some later frame copy.
+    """
+
+    def __init__(self, num_slots, max_width=1920, max_height=1080, name=None):
+        self.num_slots = num_slots
+        self.slot_bytes = self.slot_size(max_width, max_height)
+        self.max_width = max_width
+        self.max_height = max_height
+
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=num_slots * self.slot_bytes)
+            try:
+                _reserve(self.shm)
+            except OSError:
+                self.shm.close()
+                self.shm.unlink()
+                raise
+            self._owner = True
+            self._free = queue.SimpleQueue()
+            for index in range(num_slots):
+                self._free.put(index)
+        else:
+            self.shm = _attach(name)
+            self._owner = False
+            self._free = None
+
+    @staticmethod
+    def slot_size(max_width, max_height):
+        """Bytes taken by one slot holding BGR frames up to the given size"""
+        return max_width * max_height * 3
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def fits(self, frame):
+        """Whether a frame can be carried in a slot"""
+        return (frame.dtype == np.uint8 and frame.ndim == 3 and frame.shape[2] == 3
+                and frame.nbytes <= self.slot_bytes)
+
+    def acquire(self):
+        """Take a free slot index, or None if every slot is in use"""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def release(self, index):
+        self._free.put(index)
+
+    def view(self, index, shape):
+        """The frame stored in a slot, as an array backed directly by shared memory"""
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=index * self.slot_bytes)
+
+    def write(self, index, frame):
+        """Copy a frame into a slot; returns the reference workers use to read it"""
+        np.copyto(self.view(index, frame.shape), frame)
+        return index, frame.shape
+
+    def close(self):
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
@@ -0,0 +1,75 @@
+import threading
+
+
+class LatestFrameSlot:
+    """
+    Single-slot mailbox between a stream's receiver and its processor.
+
+    A frame that arrives while another is still waiting replaces it, and the
+    replaced frame is counted as dropped. The processor therefore always works
+    on the newest frame and latency stays bounded instead of growing with a
+    queue when the backend falls behind.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        """Offer a new frame, replacing any frame that has not been taken yet"""
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self.received += 1
+            self._cond.notify()
+
+    def take(self, timeout=None):
+        """
+        Wait for the newest frame and remove it from the slot. Returns None when
+        the slot is closed or the timeout expires.
+        """
+        with self._cond:
+            if self._frame is None and not self._closed:
+                self._cond.wait(timeout)
+            frame, self._frame = self._frame, None
+            return frame
+
+    def close(self):
+        """Wake up the processor and make further takes return None"""
+        with self._cond:
+            self._closed = True
+            self._frame = None
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class StreamLimiter:
+    """
+    Caps the number of open streams. Every stream holds a server thread for
+    its whole life, so the cap keeps some threads free for short requests
+    such as /health and /ready however many candidates are streaming.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def acquire(self):
+        """Claim a stream; returns False when the cap is reached"""
+        with self._lock:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+# The backend is a flat set of modules run from its own directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import CALIBRATION_POSES, data_url, draw_face  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def server():
+    """The Flask app module, configured in-process with synthetic FaceMesh graphs and no side outputs"""
+    os.environ.update({
+        "INFERENCE_WORKERS": "0",
+        "WARM_GRAPHS": "0",
+        "FACE_CHECK_INTERVAL": "0",
+        "PROFILE_STORE": "none",
+        "TIMELINE_DIR": "",
+        "EVIDENCE_DIR": "",
+        "PROFILE_SIGNING_KEY": "test-key",
+    })
+    import inference
+    from synthetic import SyntheticFaceGraph
+    inference.create_face_mesh = SyntheticFaceGraph
+    import main
+    main.app.config["TESTING"] = True
+    return main
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+@pytest.fixture
+def calibrated_session(client):
+    session_id = client.post("/calibration/start", json={}).get_json()["session_id"]
+    for center, width in CALIBRATION_POSES:
+        result = client.post("/calibration/step", json={"session_id": session_id,
+                                                        "image": data_url(draw_face(center, width))}).get_json()
+    assert result["status"] == "calibration_complete"
+    yield session_id
+    client.delete(f"/sessions/{session_id}")
@@ -0,0 +1,150 @@
+"""
+Synthetic faces for tests that cannot rely on a real FaceMesh model.
+
+A "face" is a flat-colored box with two dark pupils. SyntheticFaceGraph
+stands in for a FaceMesh graph (anything with process(rgb)): it finds the
+box by color and returns a fixed 478-point landmark template stretched over
+it, so landmarks follow the face through downscaling and cropping the same
+way real ones do.
+"""
+import base64
+import types
+
+import cv2
+import numpy as np
+
+from cheating import CheatingDetector
+from inference import FaceMeshLandmarker
+
+FACE_COLOR = (40, 200, 60)  # BGR
+BACKGROUND = 120
+FACE_ASPECT = 1.2  # height / width
+
+LEFT_EYE = (0.3, 0.4)  # eye centers, as fractions of the face box
+RIGHT_EYE = (0.7, 0.4)
+EYE_HALF_WIDTH = 0.1
+EYE_HALF_HEIGHT = 0.04
+PUPIL_RADIUS = 0.03
+
+
+def _place_eye(template, center, corners, upper, lower):
+    cx, cy = center
+    template[corners[0]] = (cx - EYE_HALF_WIDTH, cy)
+    template[corners[1]] = (cx + EYE_HALF_WIDTH, cy)
+    for points, dy in ((upper, -EYE_HALF_HEIGHT), (lower, EYE_HALF_HEIGHT)):
+        for i, index in enumerate(points):
+            template[index] = (cx - 0.05 + 0.1 * i / max(1, len(points) - 1), cy + dy)
+
+
+def landmark_template(seed=0):
+    """478 landmarks in face-box coordinates, spanning exactly [0, 1] on both axes"""
+    rng = np.random.default_rng(seed)
+    template = rng.uniform(0.05, 0.95, (478, 2))
+    template[1] = (0.5, 0.55)  # nose
+    template[234] = (0.0, 0.5)  # face sides
+    template[454] = (1.0, 0.5)
+    template[10] = (0.5, 0.0)  # forehead and chin
+    template[152] = (0.5, 1.0)
+    # EAR pairs share x: (160, 144), (158, 153) and (385, 380), (387, 373)
+    _place_eye(template, LEFT_EYE, (33, 133), [160, 159, 158, 246], [144, 145, 153, 154, 163, 7])
+    _place_eye(template, RIGHT_EYE, (362, 263), [385, 386, 387, 466, 388], [380, 374, 373, 382, 381, 390, 249])
+    template[468:473] = LEFT_EYE
+    template[473:478] = RIGHT_EYE
+    return template
+
+
+class SyntheticFaceGraph:
+    """FaceMesh stand-in that locates the synthetic face box by color"""
+
+    def __init__(self, seed=0):
+        self.template = landmark_template(seed)
+        self.shapes = []  # (height, width) of every processed image
+
+    def process(self, rgb):
+        h, w = rgb.shape[:2]
+        self.shapes.append((h, w))
+        color = np.array(FACE_COLOR[::-1], dtype=np.int16)
+        mask = np.abs(rgb.astype(np.int16) - color).sum(axis=2) < 60
+        ys, xs = np.nonzero(mask)
+        # A face touching the border is clipped; report no face like a lost track
+        if len(xs) == 0 or xs.min() == 0 or ys.min() == 0 or xs.max() == w - 1 or ys.max() == h - 1:
+            return types.SimpleNamespace(multi_face_landmarks=None)
+        x0, x1 = xs.min() / w, (xs.max() + 1) / w
+        y0, y1 = ys.min() / h, (ys.max() + 1) / h
+        points = self.template * (x1 - x0, y1 - y0) + (x0, y0)
+        landmark = [types.SimpleNamespace(x=x, y=y, z=0.0) for x, y in points]
+        return types.SimpleNamespace(multi_face_landmarks=[types.SimpleNamespace(landmark=landmark)])
+
+    def close(self):
+        pass
+
+
+def draw_face(center, width, gaze=(0, 0), size=(1280, 720), highlight=False):
+    """A BGR frame with the synthetic face at `center` (pixels), pupils shifted by `gaze` pixels
+
+    With `highlight`, each pupil gets an off-center specular reflection, a
+    bright hole in the dark blob like a light source reflected in the eye.
+    """
+    frame_w, frame_h = size
+    frame = np.full((frame_h, frame_w, 3), BACKGROUND, np.uint8)
+    height = int(width * FACE_ASPECT)
+    x0, y0 = int(center[0] - width / 2), int(center[1] - height / 2)
+    frame[max(0, y0):y0 + height, max(0, x0):x0 + width] = FACE_COLOR
+    radius = max(2, int(PUPIL_RADIUS * width))
+    for ex, ey in (LEFT_EYE, RIGHT_EYE):
+        px, py = int(x0 + ex * width + gaze[0]), int(y0 + ey * height + gaze[1])
+        frame[py - radius:py + radius + 1, px - radius:px + radius + 1] = 0
+        if highlight:
+            frame[py - radius // 2:py, px:px + radius // 2] = 255
+    return frame
+
+
+# Calibration poses in CheatingDetector's step order: center, left, right, top, bottom
+CALIBRATION_POSES = [((640, 360), 300), ((560, 360), 300), ((720, 360), 340), ((640, 320), 300), ((640, 400), 300)]
+
+
+def exam_poses():
+    """Poses that stay well clear of every alert threshold derived from CALIBRATION_POSES"""
+    poses = []
+    for center, width, gaze in [
+        ((640, 360), 300, (0, 0)),
+        ((660, 360), 300, (0, 0)),
+        ((640, 370), 300, (25, 0)),
+        ((780, 360), 380, (0, 0)),
+        ((780, 360), 380, (0, 12)),
+        ((500, 420), 240, (-25, 0)),
+        ((640, 360), 300, (0, 0)),
+        ((900, 300), 300, (0, 0)),
+        ((640, 360), 300, (0, -12)),
+    ]:
+        poses.extend([(center, width, gaze)] * 5)
+    return poses
+
+
+def run_session(landmarker=None, pupils=None, highlight=False):
+    """
+    Calibrate a detector on CALIBRATION_POSES and run it over exam_poses(),
+    returning the (status, alerts) of every exam frame. `landmarker` defaults
+    to a SyntheticFaceGraph and `pupils` to the detector's own PupilAnalyzer.
+    """
+    if landmarker is None:
+        landmarker = FaceMeshLandmarker(SyntheticFaceGraph())
+    detector = CheatingDetector(annotate=False, landmarker=landmarker)
+    if pupils is not None:
+        detector.pupils = pupils
+    detector.start_calibration()
+    for center, width in CALIBRATION_POSES:
+        assert detector.calibrate_frame(draw_face(center, width, highlight=highlight))["status"] != "error"
+
+    results = []
+    for i, (center, width, gaze) in enumerate(exam_poses()):
+        frame = draw_face(center, width, gaze, highlight=highlight)
+        result = detector.analyze_frame(frame, timestamp=1000.0 + 0.2 * i)
+        results.append((result["status"], result["alerts"]))
+    return results
+
+
+def data_url(frame):
+    """The frame as the JPEG data URL the frontend sends"""
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    return "data:image/jpeg;base64," + base64.b64encode(buffer).decode("utf-8")
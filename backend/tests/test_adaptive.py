@@ -0,0 +1,52 @@
+from inference import AdaptiveLandmarker, FaceMeshLandmarker
+from synthetic import SyntheticFaceGraph, draw_face, run_session
+
+
+def test_adaptive_mode_keeps_alert_outcomes():
+    full = run_session(FaceMeshLandmarker(SyntheticFaceGraph()))
+    adaptive_landmarker = AdaptiveLandmarker(FaceMeshLandmarker(SyntheticFaceGraph()),
+                                             FaceMeshLandmarker(SyntheticFaceGraph()))
+    adaptive = run_session(adaptive_landmarker)
+
+    assert adaptive == full
+    # The sequence must exercise both alert states and both pass kinds
+    assert any(any(alerts.values()) for _, alerts in full)
+    assert any(not any(alerts.values()) for _, alerts in full)
+    assert adaptive_landmarker.crop_passes > adaptive_landmarker.full_passes > 1
+
+
+def test_crop_passes_use_their_own_graph():
+    full_graph, crop_graph = SyntheticFaceGraph(), SyntheticFaceGraph()
+    landmarker = AdaptiveLandmarker(FaceMeshLandmarker(full_graph), FaceMeshLandmarker(crop_graph))
+    run_session(landmarker)
+
+    # Full passes only ever see the downscaled frame, crops only the crop graph
+    assert set(full_graph.shapes) == {(270, 480)}
+    assert crop_graph.shapes and (270, 480) not in crop_graph.shapes
+    # Crops where the face was lost count as full passes once retried
+    assert len(crop_graph.shapes) >= landmarker.crop_passes
+
+
+def test_crop_graph_sees_a_stable_face_while_tracking():
+    crop_graph = SyntheticFaceGraph()
+    landmarker = AdaptiveLandmarker(FaceMeshLandmarker(SyntheticFaceGraph()), FaceMeshLandmarker(crop_graph))
+    centers = []
+    original = crop_graph.process
+
+    def process(rgb):
+        results = original(rgb)
+        if results.multi_face_landmarks:
+            points = results.multi_face_landmarks[0].landmark
+            centers.append((points[1].x, points[1].y))
+        return results
+
+    crop_graph.process = process
+    # A face drifting across the frame: the crop follows it, so in crop
+    # coordinates (what the tracking graph sees) the face barely moves
+    for step in range(20):
+        assert landmarker.detect(draw_face((400 + 15 * step, 360), 300)) is not None
+
+    assert landmarker.full_passes == 1
+    assert len(centers) == 19
+    for (x0, y0), (x1, y1) in zip(centers, centers[1:]):
+        assert abs(x1 - x0) < 0.05 and abs(y1 - y0) < 0.05
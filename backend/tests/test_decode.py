@@ -0,0 +1,30 @@
+import pytest
+
+from cheating import decode_image
+from synthetic import data_url, draw_face
+
+MALFORMED = [
+    "garbage",  # no data URL header
+    "data:image/jpeg;base64,abc",  # bad padding
+    "data:image/jpeg;base64,é",  # not ASCII
+    "data:image/jpeg;base64,aGVsbG8=",  # valid base64, not an image
+    b"",
+    12,
+]
+
+
+@pytest.mark.parametrize("image", MALFORMED)
+def test_malformed_images_decode_to_none(image):
+    assert decode_image(image) is None
+
+
+def test_data_urls_decode():
+    assert decode_image(data_url(draw_face((640, 360), 300))).shape == (720, 1280, 3)
+
+
+@pytest.mark.parametrize("image", MALFORMED[:4])
+def test_malformed_images_are_reported_not_server_errors(client, calibrated_session, image):
+    for path in ("/calibration/step", "/analyze"):
+        response = client.post(path, json={"session_id": calibrated_session, "image": image})
+        assert response.status_code == 200
+        assert response.get_json() == {"status": "error", "message": "Could not decode image data"}
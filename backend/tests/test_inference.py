@@ -0,0 +1,122 @@
+import errno
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import inference
+import shared_frames
+from inference import SHM_SHARE, SLOTS_PER_WORKER, InferencePool, downscale, graphs_per_worker
+from shared_frames import FrameSlots
+
+
+@pytest.mark.parametrize("workers,graphs_per_session", [(2, 1), (4, 1), (4, 2), (8, 2), (32, 1)])
+def test_default_graph_cap_holds_a_full_node(workers, graphs_per_session):
+    max_sessions = 500
+    pool = InferencePool(workers)
+    cap = graphs_per_worker(max_sessions, workers, graphs_per_session)
+
+    for seed in range(5):
+        rng = random.Random(seed)
+        ids = [uuid.UUID(int=rng.getrandbits(128)).hex for _ in range(max_sessions)]
+        keys = ids if graphs_per_session == 1 else ids + [f"{sid}:crop" for sid in ids]
+        load = Counter(pool.worker_for(key) for key in keys)
+        # No worker ever has to evict a live session's graph
+        assert max(load.values()) <= cap
+
+
+def test_even_share_is_the_minimum():
+    assert graphs_per_worker(500, 4, spread=0) == 125
+    assert graphs_per_worker(500, 4, 2, spread=0) == 250
+
+
+def test_default_frame_slots_are_capped_per_worker():
+    assert InferencePool(32, queue_size=8).frame_slots == 32 * SLOTS_PER_WORKER
+    assert InferencePool(4, queue_size=1).frame_slots == 4
+
+
+def test_frame_slots_shrink_to_free_shared_memory(monkeypatch):
+    pool = InferencePool(4, frame_slots=8, max_frame_size=(64, 48))
+    slot_bytes = FrameSlots.slot_size(64, 48)
+
+    monkeypatch.setattr(inference, "shm_free_bytes", lambda: int(7 * slot_bytes / SHM_SHARE))
+    slots = pool._create_slots()
+    try:
+        assert slots.num_slots == 7
+    finally:
+        slots.close()
+
+    monkeypatch.setattr(inference, "shm_free_bytes", lambda: slot_bytes)
+    assert pool._create_slots() is None
+
+
+def test_frame_slots_fail_at_creation_without_room(monkeypatch):
+    def fallocate(fd, offset, length):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(shared_frames.os, "posix_fallocate", fallocate, raising=False)
+    with pytest.raises(OSError):
+        FrameSlots(2, 64, 48)
+
+
+class FakeWorker:
+    def __init__(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+
+def fake_started_pool(monkeypatch, workers=3, supervise_interval=60):
+    """A started pool whose workers are in-memory stand-ins; returns it and its spawn log"""
+    pool = InferencePool(workers, frame_slots=0, supervise_interval=supervise_interval)
+    spawned = []
+
+    def spawn(index):
+        spawned.append(index)
+        pool._workers[index] = FakeWorker()
+        pool._ready[index] = threading.Event()
+
+    monkeypatch.setattr(pool, "_spawn", spawn)
+    monkeypatch.setattr(pool, "_collect", lambda: None)
+    pool.start()
+    return pool, spawned
+
+
+def test_ready_restarts_dead_workers(monkeypatch):
+    pool, spawned = fake_started_pool(monkeypatch)
+    assert not pool.ready()  # still warming up
+    for event in pool._ready:
+        event.set()
+    assert pool.ready()
+
+    pool._workers[1].alive = False
+    # Restarted right away; the pool stays ready while the replacement warms
+    assert pool.ready()
+    assert spawned == [0, 1, 2, 1]
+    assert not pool._ready[1].is_set()
+
+
+def test_supervisor_restarts_dead_workers_without_traffic(monkeypatch):
+    pool, spawned = fake_started_pool(monkeypatch, supervise_interval=0.01)
+    pool._workers[2].alive = False
+    deadline = time.time() + 5
+    while spawned == [0, 1, 2] and time.time() < deadline:
+        time.sleep(0.01)
+    assert spawned[3:] == [2]
+
+    pool._stopping.set()
+    pool._workers[0].alive = False
+    time.sleep(0.05)
+    assert spawned[3:] == [2]
+
+
+def test_downscale_fits_the_longest_side():
+    frame = np.zeros((720, 1280, 3), np.uint8)
+    assert downscale(frame, 480).shape == (270, 480, 3)
+    assert downscale(frame[:, :10], 480).shape == (480, 7, 3)
+    assert downscale(frame, 1280) is frame
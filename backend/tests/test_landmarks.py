@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+import pytest
+
+
+def strict_json(response):
+    """Parse a response as standard JSON, which has no NaN or Infinity"""
+    def reject(constant):
+        raise ValueError(f"Non-standard JSON constant: {constant}")
+    return json.loads(response.get_data(as_text=True), parse_constant=reject)
+
+
+def post_landmarks(client, session_id, landmarks):
+    return client.post("/analyze/landmarks", json={
+        "session_id": session_id, "landmarks": landmarks, "width": 1280, "height": 720})
+
+
+def test_degenerate_landmarks_give_valid_json(client, calibrated_session):
+    response = post_landmarks(client, calibrated_session, np.zeros((478, 3)).tolist())
+    assert response.status_code == 200
+    result = strict_json(response)
+    assert result["signals"]["ear"] == {"left": 0.0, "right": 0.0}
+
+
+@pytest.mark.parametrize("value", [1e6, -3.0, 2.0])
+def test_landmarks_far_outside_the_frame_are_rejected(client, calibrated_session, value):
+    landmarks = np.full((478, 3), 0.5)
+    landmarks[10, 0] = value
+    response = post_landmarks(client, calibrated_session, landmarks.tolist())
+    assert response.status_code == 400
+
+
+def test_landmarks_slightly_outside_the_frame_are_accepted(client, calibrated_session):
+    landmarks = np.random.default_rng(0).uniform(-0.2, 1.2, (478, 3))
+    response = post_landmarks(client, calibrated_session, landmarks.tolist())
+    assert response.status_code == 200
+    strict_json(response)
@@ -0,0 +1,24 @@
+import pytest
+
+from profiles import FileProfileStore, ProfileStore, SQLiteProfileStore
+
+
+def test_incomplete_store_fails_when_constructed():
+    class ReadOnlyStore(ProfileStore):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnlyStore()
+
+
+@pytest.mark.parametrize("create", [lambda tmp_path: FileProfileStore(str(tmp_path / "profiles")),
+                                    lambda tmp_path: SQLiteProfileStore(str(tmp_path / "profiles.db"))])
+def test_stores_round_trip_profiles(tmp_path, create):
+    store = create(tmp_path)
+    profile = {"version": 1, "calibration_data": {"0": {"head": [640, 360]}}}
+    assert store.get("candidate/1") is None
+    store.put("candidate/1", profile)
+    assert store.get("candidate/1") == profile
+    store.delete("candidate/1")
+    assert store.get("candidate/1") is None
@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+import pytest
+
+from bench import ContourPupilAnalyzer
+from pupils import PupilAnalyzer
+from synthetic import run_session
+
+
+def eye_image(*blobs):
+    """A bright 40x80 eye region with (x0, y0, x1, y1, value) boxes painted over it in order"""
+    gray = np.full((40, 80), 200, np.uint8)
+    for x0, y0, x1, y1, value in blobs:
+        gray[y0:y1, x0:x1] = value
+    return gray
+
+
+def both_centers(gray):
+    """(new, contour) pupil centers for an eye region filling the whole frame"""
+    frame = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    h, w = gray.shape
+    eye = np.array([[5, 5], [w - 6, h - 6]])
+    return PupilAnalyzer().analyze(frame, eye, eye)[0], ContourPupilAnalyzer().analyze(frame, eye, eye)[0]
+
+
+@pytest.mark.parametrize("blobs", [
+    # A plain pupil
+    [(30, 12, 41, 23, 0)],
+    # A pupil with an off-center specular highlight: the hole must not pull the center
+    [(20, 8, 41, 31, 0), (32, 10, 40, 20, 255)],
+    # A long eyelash one pixel thin has more pixels than a small pupil but no area
+    [(5, 30, 75, 31, 0), (50, 10, 54, 14, 0)],
+    # A ring holds fewer dark pixels than the solid blob but encloses more
+    [(10, 10, 30, 30, 0), (12, 12, 28, 28, 255), (50, 14, 63, 27, 0)],
+    # A pupil among dozens of specks
+    [(20, 8, 41, 31, 0), (32, 10, 40, 20, 255)] + [(x, y, x + 1, y + 1, 0) for x in range(2, 78, 5)
+                                                   for y in (2, 36)],
+])
+def test_pupil_matches_contour_search(blobs):
+    center, reference = both_centers(eye_image(*blobs))
+    assert reference is not None
+    # The contour search truncated to whole pixels
+    assert reference[0] <= center[0] < reference[0] + 1 and reference[1] <= center[1] < reference[1] + 1
+
+
+@pytest.mark.parametrize("blobs", [
+    [],
+    # A lone dark pixel, a line and a one-pixel-wide bar enclose no area
+    [(40, 20, 41, 21, 0)],
+    [(10, 20, 70, 21, 0)],
+    [(40, 5, 41, 35, 0)],
+])
+def test_degenerate_blobs_are_not_pupils(blobs):
+    assert both_centers(eye_image(*blobs)) == (None, None)
+
+
+def test_pupils_keep_alert_outcomes_of_contour_search():
+    reference = run_session(pupils=ContourPupilAnalyzer(), highlight=True)
+
+    assert run_session(pupils=PupilAnalyzer(), highlight=True) == reference
+    assert any(any(alerts.values()) for _, alerts in reference)
+    assert any(not any(alerts.values()) for _, alerts in reference)
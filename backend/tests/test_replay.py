@@ -0,0 +1,17 @@
+import pytest
+
+from replay import output_names
+
+
+def test_distinct_inputs_keep_their_names():
+    assert output_names(["exam1.webm", "recordings/exam2/", "exam3.mp4"]) == ["exam1", "exam2", "exam3"]
+
+
+def test_shared_names_get_the_input_position():
+    assert output_names(["a/exam.mp4", "b/exam.mp4", "exam1/", "exam1.webm", "Exam2.mp4", "other/exam2/"]) == [
+        "exam-1", "exam-2", "exam1-3", "exam1-4", "Exam2-5", "exam2-6"]
+
+
+def test_names_that_still_clash_are_refused():
+    with pytest.raises(ValueError):
+        output_names(["exam.mp4", "exam.webm", "exam-2.mp4"])
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from profiles import sign_profile, verify_profile
+
+
+def export_profile(client, session_id):
+    response = client.get(f"/calibration/profile?session_id={session_id}")
+    assert response.status_code == 200
+    return response.get_json()["profile"]
+
+
+def js_numbers(value):
+    """What JSON.stringify in the browser makes of a value: whole floats lose their fraction"""
+    if isinstance(value, dict):
+        return {k: js_numbers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [js_numbers(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def test_exported_profile_resumes(client, calibrated_session):
+    profile = export_profile(client, calibrated_session)
+    assert "signature" in profile
+
+    response = client.post("/calibration/resume", json={"profile": js_numbers(json.loads(json.dumps(profile)))})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["status"] == "calibration_resumed"
+    client.delete(f"/sessions/{data['session_id']}")
+
+
+def test_signature_survives_browser_number_formatting():
+    profile = {"version": 1, "calibrated_positions": {"center": [[480.0, 300.5], [640.0, 300.0]]}}
+    signed = sign_profile(profile, b"key")
+    assert verify_profile(js_numbers(json.loads(json.dumps(signed))), b"key") == profile
+    assert verify_profile(signed, b"other key") is None
+
+
+def test_forged_profile_is_rejected(client, server, calibrated_session):
+    profile = export_profile(client, calibrated_session)
+    # Widen the left/right calibration so head movement never alerts
+    profile["calibration_data"]["1"]["head"][0] -= 10000
+    before = len(server.sessions)
+
+    response = client.post("/calibration/resume", json={"profile": profile})
+    assert response.status_code == 403
+
+    unsigned = {k: v for k, v in profile.items() if k != "signature"}
+    response = client.post("/calibration/resume", json={"profile": unsigned})
+    assert response.status_code == 403
+    assert len(server.sessions) == before
+
+
+@pytest.mark.parametrize("broken", [
+    {"version": 2},
+    {"version": 1, "calibration_data": {}, "calibrated_positions": {}},
+    {"version": 1, "calibration_data": {str(i): {"head": ["x", 1], "face_width": 1} for i in range(5)},
+     "calibrated_positions": {}},
+])
+def test_invalid_profile_leaves_no_session(client, server, broken):
+    before = len(server.sessions)
+    for _ in range(3):
+        response = client.post("/calibration/resume", json={"profile": sign_profile(broken, b"test-key")})
+        assert response.status_code == 400
+    assert len(server.sessions) == before
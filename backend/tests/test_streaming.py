@@ -0,0 +1,49 @@
+import os
+import runpy
+
+import pytest
+
+from streaming import LatestFrameSlot, StreamLimiter
+
+GUNICORN_CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+def test_latest_frame_wins():
+    slot = LatestFrameSlot()
+    slot.put("a")
+    slot.put("b")
+    assert slot.take(timeout=0) == "b"
+    assert slot.dropped == 1
+    slot.close()
+    assert slot.take(timeout=0) is None
+
+
+def test_stream_limiter_caps_open_streams():
+    limiter = StreamLimiter(2)
+    assert limiter.acquire() and limiter.acquire()
+    assert not limiter.acquire()
+    limiter.release()
+    assert limiter.acquire()
+    assert limiter.active == 2
+
+
+def test_default_threads_leave_a_reserve_when_every_session_streams(monkeypatch):
+    for name in ("WEB_THREADS", "WEB_RESERVED_THREADS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("MAX_SESSIONS", "500")
+    conf = runpy.run_path(GUNICORN_CONF)
+    assert conf["threads"] == 500 + conf["reserved_threads"]
+    assert conf["reserved_threads"] > 0
+
+
+def test_threads_must_exceed_the_reserve(monkeypatch):
+    monkeypatch.setenv("WEB_THREADS", "16")
+    monkeypatch.setenv("WEB_RESERVED_THREADS", "16")
+    with pytest.raises(ValueError):
+        runpy.run_path(GUNICORN_CONF)
+
+
+def test_stream_cap_matches_the_server_threads(server):
+    # The app caps streams so the gunicorn reserve is never handed to a stream
+    assert server.MAX_STREAMS == server.WEB_THREADS - server.WEB_RESERVED_THREADS
+    assert server.MAX_STREAMS >= server.MAX_SESSIONS
@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+import pytest
+
+from synthetic import BACKGROUND, data_url
+from timeline import MAGIC, OFFSET, ONSET, RECORD, SIGNAL_CODES, SIGNALS, TimelineRecorder
+
+
+def alerts(*names):
+    return {"status": "ok", "alerts": {name: True for name in names}}
+
+
+@pytest.fixture
+def timeline(tmp_path):
+    return TimelineRecorder(str(tmp_path))
+
+
+def test_signal_codes_are_stable():
+    # Codes are stored on disk: existing signals keep their index forever
+    assert SIGNALS[:7] == ("head", "eye_lr", "eye_ud", "eye_oc", "iris", "multi_face", "no_face")
+
+
+def test_file_holds_magic_and_fixed_size_records(timeline):
+    timeline.record("s1", 10.0, alerts("head"))
+    timeline.record("s1", 12.5, alerts("head", "iris"))
+    timeline.flush()
+    timeline.record("s1", 13.0, alerts())
+    timeline.flush()
+
+    with open(timeline.path("s1"), "rb") as f:
+        data = f.read()
+    # The header is written once, however many flushes append to the file
+    assert data[:len(MAGIC)] == MAGIC
+    assert len(data) == len(MAGIC) + 4 * RECORD.size and RECORD.size == 10
+    records = [RECORD.unpack_from(data, offset) for offset in range(len(MAGIC), len(data), RECORD.size)]
+    assert records[:2] == [(10.0, SIGNAL_CODES["head"], ONSET), (12.5, SIGNAL_CODES["iris"], ONSET)]
+    # Transitions of the same frame share its timestamp, in no particular order
+    assert sorted(records[2:]) == [(13.0, SIGNAL_CODES["head"], OFFSET), (13.0, SIGNAL_CODES["iris"], OFFSET)]
+
+
+def test_events_combine_flushed_and_buffered_records(timeline):
+    timeline.record("s1", 10.0, {"status": "no_face"})
+    timeline.flush()
+    timeline.record("s1", 11.0, alerts())
+    # Repeated states and errors are not transitions
+    timeline.record("s1", 11.5, alerts())
+    timeline.record("s1", 12.0, {"status": "error", "message": "Could not decode image data"})
+
+    events = timeline.events("s1")
+    assert events.tolist() == [(10.0, SIGNAL_CODES["no_face"], ONSET), (11.0, SIGNAL_CODES["no_face"], OFFSET)]
+    timeline.flush()
+    assert np.array_equal(timeline.events("s1"), events)
+    assert timeline.events("unknown").size == 0
+
+
+def test_summarize_clips_intervals_to_the_window(timeline):
+    timeline.record("s1", 10.0, alerts("head"))
+    timeline.record("s1", 14.0, alerts())
+    timeline.record("s1", 20.0, alerts("eye_lr"))
+    timeline.record("s1", 21.0, alerts())
+    timeline.record("s1", 30.0, alerts("head"))
+
+    full = timeline.summarize("s1")
+    assert full["intervals"] == [
+        {"signal": "head", "start": 10.0, "end": 14.0, "duration": 4.0},
+        {"signal": "eye_lr", "start": 20.0, "end": 21.0, "duration": 1.0},
+        {"signal": "head", "start": 30.0, "end": None, "duration": None},
+    ]
+    # The open interval counts but adds no time
+    assert full["summary"] == {"head": {"count": 2, "seconds": 4.0}, "eye_lr": {"count": 1, "seconds": 1.0}}
+
+    window = timeline.summarize("s1", start=12.0, end=20.5)
+    assert window["intervals"] == [
+        {"signal": "head", "start": 12.0, "end": 14.0, "duration": 2.0},
+        {"signal": "eye_lr", "start": 20.0, "end": 20.5, "duration": 0.5},
+    ]
+    assert timeline.summarize("s1", start=15.0, end=19.0) == {"intervals": [], "summary": {}}
+
+
+def test_end_closes_open_intervals(timeline):
+    timeline.record("s1", 10.0, alerts("head", "iris"))
+    timeline.end("s1", 16.0)
+    timeline.flush()
+
+    intervals = timeline.summarize("s1")["intervals"]
+    assert sorted((i["signal"], i["start"], i["end"]) for i in intervals) == [("head", 10.0, 16.0),
+                                                                              ("iris", 10.0, 16.0)]
+    # A later session with the same state starts from scratch
+    timeline.record("s1", 20.0, alerts("head"))
+    assert timeline.events("s1")[-1].tolist() == (20.0, SIGNAL_CODES["head"], ONSET)
+
+
+def test_invalid_session_ids_are_rejected(timeline):
+    with pytest.raises(ValueError):
+        timeline.path("../escape")
+
+
+def test_evicted_sessions_close_their_intervals(server, client, calibrated_session, timeline, monkeypatch):
+    monkeypatch.setattr(server, "timeline", timeline)
+    blank = data_url(np.full((720, 1280, 3), BACKGROUND, np.uint8))
+    start = time.time() - 1.5
+    for t in (start, start + 1.0):
+        result = client.post("/analyze", json={"session_id": calibrated_session, "image": blank,
+                                               "timestamp": t * 1000}).get_json()
+        assert result["status"] == "no_face"
+
+    session = server.sessions.get(calibrated_session)
+    session.last_seen -= server.sessions.idle_timeout + 1
+    assert server.sessions.evict_idle() == 1
+
+    # The open no_face interval ends on the last frame's time, not at eviction
+    assert timeline.summarize(calibrated_session)["intervals"] == [
+        {"signal": "no_face", "start": round(start, 3), "end": round(start + 1.0, 3), "duration": 1.0}]
@@ -0,0 +1,43 @@
+import pytest
+
+from timeline import TimelineRecorder
+
+
+def test_frame_time_is_bounded_by_the_receive_time(server):
+    tolerance = server.FRAME_TIME_TOLERANCE
+    received = 1000.0
+    assert server.frame_time(None, received) == received
+    assert server.frame_time(received - 0.3, received) == received - 0.3
+    # Captured long ago (or a frozen clock) and captured in the future
+    assert server.frame_time(received - 60, received) == received - tolerance
+    assert server.frame_time(received + 60, received) == received
+
+
+def test_repeated_timestamp_cannot_freeze_the_timers(server):
+    frozen = 1000.0
+    times = [server.frame_time(frozen, frozen + 0.5 * i) for i in range(20)]
+    assert times == sorted(times)
+    assert times[-1] - times[0] >= 9.5 - server.FRAME_TIME_TOLERANCE
+
+
+def test_analyze_clamps_client_timestamps(server, client, monkeypatch):
+    now = 5000.0
+    monkeypatch.setattr(server.time, "time", lambda: now)
+    with server.app.test_request_context("/analyze", headers={"X-Frame-Timestamp": "1000"}):
+        assert server.get_frame_timestamp() == pytest.approx(now - server.FRAME_TIME_TOLERANCE)
+    with server.app.test_request_context("/analyze", json={"timestamp": (now - 0.25) * 1000}):
+        assert server.get_frame_timestamp() == pytest.approx(now - 0.25)
+
+
+def test_closed_session_intervals_end_on_frame_time(server, tmp_path, monkeypatch):
+    timeline = TimelineRecorder(str(tmp_path))
+    monkeypatch.setattr(server, "timeline", timeline)
+    session = server.sessions.create()
+
+    # A client whose clock runs an hour behind the server
+    timeline.record(session.session_id, 100.0, {"status": "no_face"})
+    session.detector.last_frame_time = 104.0
+    server.sessions.remove(session.session_id)
+
+    intervals = timeline.summarize(session.session_id)["intervals"]
+    assert intervals == [{"signal": "no_face", "start": 100.0, "end": 104.0, "duration": 4.0}]
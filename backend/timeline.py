@@ -0,0 +1,195 @@
+import logging
+import os
+import re
+import struct
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Signals tracked on the timeline; the index is the code stored on disk, so
+# new signals must only ever be appended
+SIGNALS = ("head", "eye_lr", "eye_ud", "eye_oc", "iris", "multi_face", "no_face")
+SIGNAL_CODES = {name: code for code, name in enumerate(SIGNALS)}
+
+ONSET = 1
+OFFSET = 0
+
+# Each file starts with MAGIC followed by fixed-size little-endian records of
+# (timestamp seconds: float64, signal code: uint8, ONSET/OFFSET: uint8)
+MAGIC = b"PTL1"
+RECORD = struct.Struct("<dBB")
+RECORD_DTYPE = np.dtype([("t", "<f8"), ("signal", "u1"), ("state", "u1")])
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def active_signals(result):
+    """The set of timeline signals raised by one process_frame result"""
+    active = {name for name, raised in result.get("alerts", {}).items() if raised and name in SIGNAL_CODES}
+    if result.get("status") == "no_face":
+        active.add("no_face")
+    return active
+
+
+class AlertStates:
+    """Tracks the active timeline signals of each session and reports transitions"""
+
+    def __init__(self):
+        self._states = {}  # session_id -> set of active signals
+        self._lock = threading.Lock()
+
+    def update(self, session_id, result):
+        """Store the signals raised by result; returns the (onsets, offsets) since the last result"""
+        active = active_signals(result)
+        with self._lock:
+            previous = self._states.get(session_id, set())
+            self._states[session_id] = active
+        return active - previous, previous - active
+
+    def pop(self, session_id):
+        """Forget a session; returns the signals that were still active"""
+        with self._lock:
+            return self._states.pop(session_id, set())
+
+
+class TimelineRecorder:
+    """
+    Append-only per-session log of alert onsets and offsets.
+
+    Only transitions are stored, ten bytes each, so a session that stays
+    clean for an hour costs nothing beyond its file header. record() is
+    called on the request path and only compares states and buffers the
+    transitions; a background thread appends the buffered events of every
+    session to its file once per `flush_interval`.
+    """
+
+    def __init__(self, directory, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._states = AlertStates()
+        self._pending = defaultdict(list)  # session_id -> [(t, code, state)]
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background writer (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="timeline-writer", daemon=True)
+            self._thread.start()
+
+    def path(self, session_id):
+        if not _SESSION_ID.match(session_id):
+            raise ValueError(f"Invalid session ID: {session_id!r}")
+        return os.path.join(self.directory, f"{session_id}.tl")
+
+    def record(self, session_id, timestamp, result):
+        """Buffer the onsets and offsets between the previous result and this one"""
+        if result.get("status") not in ("ok", "no_face"):
+            return
+        self.start()
+        onsets, offsets = self._states.update(session_id, result)
+        if not onsets and not offsets:
+            return
+        with self._lock:
+            events = self._pending[session_id]
+            for name in offsets:
+                events.append((timestamp, SIGNAL_CODES[name], OFFSET))
+            for name in onsets:
+                events.append((timestamp, SIGNAL_CODES[name], ONSET))
+
+    def end(self, session_id, timestamp):
+        """Close every open interval of a finished session"""
+        previous = self._states.pop(session_id)
+        if previous:
+            with self._lock:
+                self._pending[session_id].extend(
+                    (timestamp, SIGNAL_CODES[name], OFFSET) for name in previous)
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error writing alert timelines: {str(e)}")
+
+    def flush(self):
+        """Append all buffered events to their session files"""
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, defaultdict(list)
+            for session_id, events in batch.items():
+                data = b"".join(RECORD.pack(*event) for event in events)
+                with open(self.path(session_id), "ab") as f:
+                    if f.tell() == 0:
+                        f.write(MAGIC)
+                    f.write(data)
+
+    def events(self, session_id):
+        """All events of a session, flushed or still buffered, as a structured array"""
+        path = self.path(session_id)
+        with self._write_lock:
+            try:
+                with open(path, "rb") as f:
+                    if f.read(len(MAGIC)) != MAGIC:
+                        raise ValueError(f"Not a timeline file: {path}")
+                    stored = np.frombuffer(f.read(), dtype=RECORD_DTYPE)
+            except FileNotFoundError:
+                stored = np.empty(0, dtype=RECORD_DTYPE)
+            with self._lock:
+                pending = np.array(self._pending.get(session_id, []), dtype=RECORD_DTYPE)
+        return np.concatenate([stored, pending])
+
+    def summarize(self, session_id, start=None, end=None):
+        """
+        Alert intervals of a session, optionally clipped to [start, end], with
+        per-signal counts and total durations. Intervals still open have an
+        end of None and are not included in the totals.
+        """
+        events = self.events(session_id)
+        opened = {}
+        intervals = []
+        for t, code, state in events.tolist():
+            name = SIGNALS[code]
+            if state == ONSET:
+                opened[name] = t
+            elif name in opened:
+                intervals.append([name, opened.pop(name), t])
+        for name, t in opened.items():
+            intervals.append([name, t, None])
+        intervals.sort(key=lambda interval: interval[1])
+
+        windowed = []
+        totals = {}
+        for name, t0, t1 in intervals:
+            if end is not None and t0 > end:
+                continue
+            if start is not None and t1 is not None and t1 < start:
+                continue
+            if start is not None:
+                t0 = max(t0, start)
+            if end is not None and t1 is not None:
+                t1 = min(t1, end)
+            windowed.append({
+                "signal": name,
+                "start": round(t0, 3),
+                "end": round(t1, 3) if t1 is not None else None,
+                "duration": round(t1 - t0, 3) if t1 is not None else None
+            })
+            total = totals.setdefault(name, {"count": 0, "seconds": 0.0})
+            total["count"] += 1
+            if t1 is not None:
+                total["seconds"] = round(total["seconds"] + t1 - t0, 3)
+
+        return {"intervals": windowed, "summary": totals}
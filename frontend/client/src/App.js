@@ -1,10 +1,11 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
 import CalibrationPanel from './components/CalibrationPanel';
 import MonitoringPanel from './components/MonitoringPanel';
 import StatusPanel from './components/StatusPanel';
 
 const API_URL = 'http://localhost:5000'; // Change this to your backend URL if different
+const WS_URL = API_URL.replace(/^http/, 'ws');
 
 function App() {
   const [isConnected, setIsConnected] = useState(false);
@@ -15,6 +16,11 @@ function App() {
   const [mode, setMode] = useState('setup'); // 'setup', 'calibration', 'monitoring'
   const [messages, setMessages] = useState([]);
   const [cheatingDetected, setCheatingDetected] = useState(false);
+  // Session ID issued by /calibration/start; kept in a ref so the monitoring
+  // interval always sees the current value
+  const sessionIdRef = useRef(sessionStorage.getItem('sessionId'));
+  // Streaming analysis channel used while monitoring
+  const socketRef = useRef(null);
 
   // Check connection to backend
   useEffect(() => {
@@ -52,9 +58,14 @@ function App() {
   const checkDetectorStatus = async () => {
     try {
       console.log("Checking detector status...");
-      const response = await fetch(`${API_URL}/status`);
+      const sessionId = sessionIdRef.current;
+      const query = sessionId ? `?session_id=${encodeURIComponent(sessionId)}` : '';
+      const response = await fetch(`${API_URL}/status${query}`);
       const data = await response.json();
       console.log("Detector status:", data);
+      if (!data.calibrated && await resumeCalibration()) {
+        return;
+      }
       setCalibrated(data.calibrated);
       if (data.calibrated) {
         setCalibrationStep("complete");
@@ -71,16 +82,63 @@ function App() {
     }
   };
 
+  // Restore a calibration saved by this tab after the backend lost the
+  // session (restart, eviction or a different worker) instead of recalibrating
+  const resumeCalibration = async () => {
+    const profile = sessionStorage.getItem('calibrationProfile');
+    if (!profile) return false;
+    try {
+      const response = await fetch(`${API_URL}/calibration/resume`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ session_id: sessionIdRef.current, profile: JSON.parse(profile) })
+      });
+      const data = await response.json();
+      if (data.status !== 'calibration_resumed') {
+        sessionStorage.removeItem('calibrationProfile');
+        return false;
+      }
+      sessionIdRef.current = data.session_id;
+      sessionStorage.setItem('sessionId', data.session_id);
+      setCalibrated(true);
+      setCalibrationStep('complete');
+      if (mode === 'setup') {
+        setMode('monitoring');
+        setMessages(prev => [...prev, 'Calibration restored. Starting monitoring...']);
+      }
+      return true;
+    } catch (error) {
+      console.error('Failed to resume calibration:', error);
+      return false;
+    }
+  };
+
+  const saveCalibrationProfile = async () => {
+    try {
+      const sessionId = encodeURIComponent(sessionIdRef.current);
+      const response = await fetch(`${API_URL}/calibration/profile?session_id=${sessionId}`);
+      const data = await response.json();
+      if (data.status === 'ok') {
+        sessionStorage.setItem('calibrationProfile', JSON.stringify(data.profile));
+      }
+    } catch (error) {
+      console.error('Failed to save calibration profile:', error);
+    }
+  };
+
   const startCalibration = async () => {
     try {
       const response = await fetch(`${API_URL}/calibration/start`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' }
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ session_id: sessionIdRef.current })
       });
       
       const data = await response.json();
       console.log("Calibration start response:", data);
       if (data.status === 'calibration_started') {
+        sessionIdRef.current = data.session_id;
+        sessionStorage.setItem('sessionId', data.session_id);
         setCalibrationStep(data.current_step);
         setTotalCalibrationSteps(data.total_steps);
         setCalibrationInstructions(data.steps);
@@ -100,7 +158,7 @@ function App() {
       const response = await fetch(`${API_URL}/calibration/step`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ image: imageData })
+        body: JSON.stringify({ image: imageData, session_id: sessionIdRef.current })
       });
       
       const data = await response.json();
@@ -110,6 +168,7 @@ function App() {
         setCalibrated(true);
         setCalibrationStep('complete');
         setMessages(prev => [...prev, 'Calibration complete! Ready for monitoring.']);
+        saveCalibrationProfile();
         // Add a small delay before switching to monitoring to ensure everything is ready
         setTimeout(() => {
           setMode('monitoring');
@@ -126,7 +185,7 @@ function App() {
     }
   };
 
-  const analyzeFrame = async (imageData) => {
+  const analyzeFrame = async (imageData, capturedAt) => {
     if (!imageData) {
       console.error("No image data provided to analyzeFrame");
       return null;
@@ -137,7 +196,7 @@ function App() {
       const response = await fetch(`${API_URL}/analyze`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ image: imageData })
+        body: JSON.stringify({ image: imageData, session_id: sessionIdRef.current, timestamp: capturedAt })
       });
       
       const data = await response.json();
@@ -162,6 +221,51 @@ function App() {
     }
   };
 
+  const handleStreamResult = (event) => {
+    const data = JSON.parse(event.data);
+    
+    if (data.status === 'ok') {
+      setCheatingDetected(data.cheating_detected);
+      setMessages(data.messages);
+    } else if (data.status === 'no_face') {
+      setMessages(['No face detected']);
+    } else if (data.status === 'error') {
+      console.error("Error analyzing frame:", data.message);
+      setMessages([`Error: ${data.message}`]);
+    }
+    
+    if (data.dropped) {
+      console.log(`Frames dropped by server: ${data.dropped}`);
+    }
+  };
+
+  // Send a binary frame over the analysis stream, opening it on first use.
+  // The server only processes the newest frame, so we never wait for replies.
+  const sendFrame = (blob, capturedAt) => {
+    let socket = socketRef.current;
+    if (!socket || socket.readyState === WebSocket.CLOSING || socket.readyState === WebSocket.CLOSED) {
+      const sessionId = encodeURIComponent(sessionIdRef.current);
+      socket = new WebSocket(`${WS_URL}/ws/analyze?session_id=${sessionId}`);
+      socket.onmessage = handleStreamResult;
+      socket.onerror = (error) => console.error('Analysis stream error:', error);
+      socketRef.current = socket;
+    }
+    
+    if (socket.readyState === WebSocket.OPEN) {
+      // Each binary frame is preceded by its capture timestamp
+      socket.send(JSON.stringify({ timestamp: capturedAt }));
+      socket.send(blob);
+    }
+  };
+
+  // Close the analysis stream when leaving monitoring mode
+  useEffect(() => {
+    if (mode !== 'monitoring' && socketRef.current) {
+      socketRef.current.close();
+      socketRef.current = null;
+    }
+  }, [mode]);
+
   const handleNextStep = (imageData) => {
     processCalibrationStep(imageData);
   };
@@ -227,6 +331,7 @@ function App() {
         {mode === 'monitoring' && (
           <MonitoringPanel 
             onAnalyzeFrame={analyzeFrame}
+            onSendFrame={sendFrame}
             cheatingDetected={cheatingDetected}
           />
         )}
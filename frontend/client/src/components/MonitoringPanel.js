@@ -197,7 +197,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import './MonitoringPanel.css';
 
-function MonitoringPanel({ onAnalyzeFrame, cheatingDetected }) {
+function MonitoringPanel({ onAnalyzeFrame, onSendFrame, cheatingDetected }) {
   const videoRef = useRef(null);
   const canvasRef = useRef(null);
   const analysisIntervalRef = useRef(null);
@@ -257,11 +257,18 @@ function MonitoringPanel({ onAnalyzeFrame, cheatingDetected }) {
       
       // Start sending frames at regular intervals (e.g., every 500ms)
       analysisIntervalRef.current = setInterval(async () => {
+        if (onSendFrame) {
+          // Streaming mode: send binary frames without waiting for results
+          captureBlob(onSendFrame);
+          return;
+        }
+        
+        const capturedAt = Date.now();
         const imageData = captureImage();
         if (imageData) {
           console.log("Frame captured, sending for analysis");
           try {
-            const processedImage = await onAnalyzeFrame(imageData);
+            const processedImage = await onAnalyzeFrame(imageData, capturedAt);
             if (processedImage) {
               setDisplayImage(processedImage);
             }
@@ -310,6 +317,26 @@ function MonitoringPanel({ onAnalyzeFrame, cheatingDetected }) {
     return null;
   };
   
+  const captureBlob = (callback) => {
+    const video = videoRef.current;
+    const canvas = canvasRef.current;
+    
+    if (video && canvas && video.readyState === 4) { // 4 = HAVE_ENOUGH_DATA
+      const context = canvas.getContext('2d');
+      canvas.width = video.videoWidth;
+      canvas.height = video.videoHeight;
+      context.drawImage(video, 0, 0, canvas.width, canvas.height);
+      // Capture time, so the backend's timers follow the camera and not the network
+      const capturedAt = Date.now();
+      
+      canvas.toBlob((blob) => {
+        if (blob) {
+          callback(blob, capturedAt);
+        }
+      }, 'image/jpeg', 0.8);
+    }
+  };
+  
   // Auto-start monitoring when the camera is ready
   useEffect(() => {
     if (cameraReady) {
@@ -347,7 +374,7 @@ function MonitoringPanel({ onAnalyzeFrame, cheatingDetected }) {
               alt="Processed feed" 
               className="processed-feed" 
             />
-          ) : (
+          ) : !cameraReady && (
             <div className="loading-feed">
               <p>Starting camera...</p>
             </div>